@@ -1,15 +1,37 @@
-import streamlit as st
 import pandas as pd
 from models import *
+from timeindex import ensure_sorted
+from compact import ENTITY_COLUMNS
+from cache import cached
+import instrument
+from ranking import rank_order
 import numpy as np
 
 MS_MIN_CONVERSION = 60000
 MS_HOUR_CONVERSION = 3600000
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 86400 * 10**9
 DAYS_PER_MONTH = 30.44
 TOP_SONG_COLUMN_ORDER = ['spotify_track_uri', 'track_name', 'artist_name', 'album_name',
                 'total_plays', 'plays_no_skips', 'total_minutes', 'mean_listen_mins', 'skip_percentage']
 TOP_ALBUM_COLUMN_ORDER = ['album_name', 'artist_name', 'unique_tracks',
                 'total_plays', 'plays_no_skips', 'total_minutes', 'mean_listen_mins', 'skip_percentage']
+COLUMN_ENTITIES = {column: entity for entity, column in ENTITY_COLUMNS.items()}
+LEVEL_SUMMARIES = {
+    'track': ('uri', 'spotify_track_uri', {
+        'track_name': ('track', 'first'),
+        'artist_name': ('artist', 'first'),
+        'album_name': ('album', 'first')
+    }),
+    'artist': ('artist', 'artist_name', {
+        'unique_tracks': ('track', 'nunique'),
+        'unique_albums': ('album', 'nunique')
+    }),
+    'album': ('album', 'album_name', {
+        'unique_tracks': ('track', 'nunique'),
+        'artist_name': ('artist', 'first')
+    })
+}
 
 def reorganiseColumns(df, column_order=None):
     if column_order is None:
@@ -24,38 +46,42 @@ def reorganiseColumns(df, column_order=None):
 #     return df
 
 def containsOne(df):
-    unique_uris = df['spotify_track_uri'].nunique()
-
-    if unique_uris > 1:
-        found_versions = (
-            df.groupby([
-                'master_metadata_track_name', 
-                'master_metadata_album_artist_name'
-            ])
-            .agg({
-                'master_metadata_album_album_name': lambda x: x.value_counts().idxmax(),
-                'spotify_track_uri': 'count'
-            })
-            .reset_index()
-            .rename(columns={
-                "master_metadata_track_name": "Track Name",
-                "master_metadata_album_artist_name": "Artist",
-                "master_metadata_album_album_name": "Album",
-                "spotify_track_uri": "Listens"
-            })
-        )
-        st.write(f"Found Multiple ({unique_uris}) Songs - please refine your search")
-        st.dataframe(found_versions.sort_values('Listens', ascending=False), width='stretch', hide_index=True)
-        return False
-    
-    return True
+    return df['spotify_track_uri'].nunique() <= 1
+
+def song_versions(df):
+    pair_cols = ['master_metadata_track_name', 'master_metadata_album_artist_name']
+    most_played_album = (
+        df.groupby(pair_cols + ['master_metadata_album_album_name'], observed=True)
+        .size()
+        .reset_index(name='album_listens')
+        .sort_values('album_listens', ascending=False, kind='stable')
+        .drop_duplicates(subset=pair_cols)
+        .drop(columns=['album_listens'])
+    )
+    found_versions = (
+        df.groupby(pair_cols, observed=True)['spotify_track_uri']
+        .count()
+        .reset_index()
+        .merge(most_played_album, on=pair_cols, how='left')
+        .loc[:, pair_cols + ['master_metadata_album_album_name', 'spotify_track_uri']]
+        .rename(columns={
+            "master_metadata_track_name": "Track Name",
+            "master_metadata_album_artist_name": "Artist",
+            "master_metadata_album_album_name": "Album",
+            "spotify_track_uri": "Listens"
+        })
+    )
+    return found_versions.sort_values('Listens', ascending=False)
 
-def song_sum_stats(df):
+def song_sum_stats(df, entity_stats=None):
     if df is None or df.empty:
         return None
     
-    df['ts'] = pd.to_datetime(df['ts'])
-    df = df.sort_values('ts')
+    df = ensure_sorted(df)
+    if entity_stats is not None:
+        stats = entity_stats.song_stats(df)
+        if stats is not None:
+            return stats
 
     name = df['master_metadata_track_name'].iloc[0]
     artist = df['master_metadata_album_artist_name'].iloc[0]
@@ -73,13 +99,13 @@ def song_sum_stats(df):
     tot_mins = df['ms_played'].sum() / MS_MIN_CONVERSION
     avg_plays_per_month = tot_plays / (max(timespan, 1) / DAYS_PER_MONTH)
     
-    df['month_year'] = df['ts'].dt.to_period('M')
-    peak_month = df['month_year'].value_counts().idxmax()
-    peak_month_count = df['month_year'].value_counts().max()
+    month_year = df['ts'].dt.to_period('M')
+    peak_month = month_year.value_counts().idxmax()
+    peak_month_count = month_year.value_counts().max()
     
-    df['date'] = df['ts'].dt.to_period('D')
-    most_plays_in_day_date = df['date'].value_counts().idxmax()
-    most_plays_in_day = df['date'].value_counts().max()
+    date = df['ts'].dt.to_period('D')
+    most_plays_in_day_date = date.value_counts().idxmax()
+    most_plays_in_day = date.value_counts().max()
 
     return SongStats(
         name=name,
@@ -100,13 +126,23 @@ def song_sum_stats(df):
         peak_month_count=peak_month_count
     )
 
-def filter_dataframe(df, column, value, exact=False):
+def filter_dataframe(df, column, value, exact=False, index=None):
+    if index is not None:
+        return df.iloc[index.rows(COLUMN_ENTITIES[column], value, exact)]
     if exact:
         return df[df[column] == value]
     else:
         return df[df[column].str.contains(value, case=False, na=False)]
 
-def get_song(df, song_name, exact=False, artist=None, album=None):
+def get_song(df, song_name, exact=False, artist=None, album=None, index=None):
+    if index is not None:
+        rows = index.rows('track', song_name, exact)
+        if artist:
+            rows = index.refine(rows, 'artist', artist, exact)
+        if album:
+            rows = index.refine(rows, 'album', album, exact)
+        return df.iloc[rows]
+
     mask = pd.Series([True] * len(df), index=df.index)
 
     if exact:
@@ -130,19 +166,16 @@ def get_song(df, song_name, exact=False, artist=None, album=None):
 
     return song_history
 
-def get_song_stats(df, song_name, exact=False, artist=None, album=None):
-    song_history = get_song(df, song_name, exact, artist, album)
+def get_song_stats(df, song_name, exact=False, artist=None, album=None, index=None):
+    song_history = get_song(df, song_name, exact, artist, album, index)
 
     if song_history.empty:
-        st.write(f"No matches found for Song: '{song_name}', Artist: '{artist}', Album: '{album}'.")
-        return None
+        return NoMatch(f"No matches found for Song: '{song_name}', Artist: '{artist}', Album: '{album}'.")
 
     if not containsOne(song_history):
-        return None
+        return AmbiguousMatch(f"Found Multiple ({song_history['spotify_track_uri'].nunique()}) Songs - please refine your search", song_versions(song_history))
     
-    song_history['ts'] = pd.to_datetime(song_history['ts'])
-    song_history = song_history.sort_values('ts')
-    return song_history
+    return ensure_sorted(song_history)
 
 def random_play(df):
     random_row = df.sample()
@@ -151,14 +184,20 @@ def random_play(df):
               random_row['master_metadata_album_album_name'].iloc[0])
     return random
 
+def _first_valid_play(df, cols, positions):
+    for pos in positions:
+        play = df.iloc[pos][cols]
+        if play.notna().all():
+            return tuple(play)
+    return None
+
+# Expects df sorted by ts (as the loaded dataset is), so first/last are read off the ends
 def firstLastPlay(df):
-    df = df.sort_values('ts')
     cols = ['ts', 'master_metadata_track_name', 'master_metadata_album_artist_name', 'master_metadata_album_album_name']
-    validPlays = df.dropna(subset=cols)
+    first_play = _first_valid_play(df, cols, range(len(df)))
 
-    if not validPlays.empty:
-        first_play = tuple(validPlays.iloc[0][cols])
-        last_play = tuple(validPlays.iloc[-1][cols])
+    if first_play is not None:
+        last_play = _first_valid_play(df, cols, range(len(df) - 1, -1, -1))
         tspan = (last_play[0] - first_play[0]).days
     else:
         first_play = last_play = None
@@ -189,103 +228,144 @@ def basicStats(df):
         unique_albums=unique_albums
     )
 
-@st.cache_data
 def aggregate_by(df, group_col, name_cols=None):
     if name_cols is None:
         name_cols = {}
     
     agg_dict = {
         'total_ms': ('ms_played', 'sum'),
-        'total_plays': ('ms_played', 'count'),
-        'mean_listen_ms': ('ms_played', 'mean'),
-        'plays_no_skips': ('skipped', lambda x: (x == False).sum())
+        'total_plays': ('ms_played', 'count')
     }
     
     agg_dict.update(name_cols)
     
-    summary = df.groupby(group_col).agg(**agg_dict).reset_index()
+    grouped = df.groupby(group_col, observed=True)
+    summary = grouped.agg(**agg_dict)
+    summary.insert(2, 'plays_no_skips', df['skipped'].eq(False).groupby(df[group_col], observed=True).sum())
+    summary = summary.reset_index()
     
+    return add_summary_rates(summary)
+
+def add_summary_rates(summary):
     summary['total_minutes'] = summary['total_ms'] / MS_MIN_CONVERSION
-    summary['mean_listen_mins'] = summary['mean_listen_ms'] / MS_MIN_CONVERSION
+    summary['mean_listen_mins'] = summary['total_ms'] / summary['total_plays'] / MS_MIN_CONVERSION
     summary['skip_percentage'] = (1 - (summary['plays_no_skips'] / summary['total_plays'])) * 100
     
-    summary = summary.drop(columns=['total_ms', 'mean_listen_ms'])
+    summary = summary.drop(columns=['total_ms'])
     
     return summary
 
-def get_artist(df, artist, exact):
-    return filter_dataframe(df, 'master_metadata_album_artist_name', artist, exact)
+def entity_names(df):
+    return {entity: df[column].cat.categories for entity, column in ENTITY_COLUMNS.items()}
+
+# The one pass over the plays: every (uri, track, artist, album) combination - plus any
+# extra keys such as a day number - reduced to sums with vectorized groupby reductions.
+# Track, artist and album summaries are all rolled up from these cells.
+def play_cells(df, keys=None):
+    plays = pd.DataFrame(keys or {})
+    for entity, column in ENTITY_COLUMNS.items():
+        plays[entity] = df[column].cat.codes.to_numpy()
+    plays['ms_played'] = df['ms_played'].to_numpy(dtype=np.int64)
+    plays['no_skip'] = df['skipped'].eq(False).to_numpy(dtype=bool, na_value=False)
+    plays['row'] = np.arange(len(df))
+
+    return (
+        plays.groupby(list(keys or {}) + list(ENTITY_COLUMNS), sort=True)
+        .agg(
+            total_ms=('ms_played', 'sum'),
+            total_plays=('ms_played', 'size'),
+            plays_no_skips=('no_skip', 'sum'),
+            first_row=('row', 'min'),
+            last_row=('row', 'max')
+        )
+        .reset_index()
+    )
+
+def _decode(names, entity, codes):
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64)
+    return pd.Categorical.from_codes(codes, categories=names[entity])
+
+def summarise_cells(cells, names, level):
+    group_key, group_name, name_aggs = LEVEL_SUMMARIES[level]
+
+    # -1 codes are missing names; as NaN they drop out of groupbys and nunique like the raw columns do.
+    # 'first' follows the order plays appear in the dataset, as it does on the raw frame.
+    cells = cells.assign(**{entity: cells[entity].where(cells[entity] >= 0) for entity in ENTITY_COLUMNS})
+    cells = cells.sort_values('first_row', kind='stable')
+    summary = cells.groupby(group_key, sort=True).agg(
+        total_ms=('total_ms', 'sum'),
+        total_plays=('total_plays', 'sum'),
+        plays_no_skips=('plays_no_skips', 'sum'),
+        **name_aggs
+    ).reset_index()
+
+    for col, (entity, func) in name_aggs.items():
+        if func == 'first':
+            summary[col] = _decode(names, entity, summary[col])
+    summary[group_key] = _decode(names, group_key, summary[group_key])
+
+    return add_summary_rates(summary.rename(columns={group_key: group_name}))
+
+@cached
+def levelAnalytics(df):
+    cells = play_cells(df)
+    names = entity_names(df)
+    return LevelSummaries(
+        songs=summarise_cells(cells, names, 'track'),
+        artists=summarise_cells(cells, names, 'artist'),
+        albums=summarise_cells(cells, names, 'album')
+    )
+
+def get_artist(df, artist, exact, index=None):
+    return filter_dataframe(df, 'master_metadata_album_artist_name', artist, exact, index)
 
-def get_artist_hist(df, artist, exact=False):
-    artist_hist = get_artist(df, artist, exact)
+def get_artist_hist(df, artist, exact=False, index=None):
+    artist_hist = get_artist(df, artist, exact, index)
     
     unique_artists = artist_hist['master_metadata_album_artist_name'].nunique()
     
     if unique_artists > 1:
         found_artists = (
-            artist_hist.groupby('master_metadata_album_artist_name')
+            artist_hist.groupby('master_metadata_album_artist_name', observed=True)
             .size()
             .reset_index(name='Listens')
             .rename(columns={
                 "master_metadata_album_artist_name": "Artist",
             })
         )
-        st.write(f"Found Multiple ({unique_artists}) Artists - please refine your search")
-        st.dataframe(found_artists.sort_values('Listens', ascending=False), width='stretch', hide_index=True)
-        return None
+        return AmbiguousMatch(f"Found Multiple ({unique_artists}) Artists - please refine your search", found_artists.sort_values('Listens', ascending=False))
     elif artist_hist.empty:
-        st.write(f"Could not find an artist containing '{artist}'")
-        return None
+        return NoMatch(f"Could not find an artist containing '{artist}'")
     else:
         return artist_hist
 
-@st.cache_data
 def dfAnalytics(df):
-    return aggregate_by(
-        df,
-        group_col='spotify_track_uri',
-        name_cols={
-            'track_name': ('master_metadata_track_name', 'first'),
-            'artist_name': ('master_metadata_album_artist_name', 'first'),
-            'album_name': ('master_metadata_album_album_name', 'first')
-        }
-    )
+    return levelAnalytics(df).songs
 
 def get_top_n(df, sort_configs, n=5, min_plays_filter=None):
+    ranks = rank_order(df)
     results = {}
     
     for key, config in sort_configs.items():
-        sorted_df = df.copy()
-        
-        if min_plays_filter and 'min_plays' in config:
-            sorted_df = sorted_df[sorted_df['total_plays'] >= config['min_plays']]
-        
         if isinstance(config['by'], list):
-            sorted_df = sorted_df.sort_values(
-                by=config['by'],
-                ascending=config.get('ascending', [True] * len(config['by']))
-            )
+            by = tuple(config['by'])
+            ascending = tuple(config.get('ascending', [True] * len(by)))
         else:
-            sorted_df = sorted_df.sort_values(
-                by=config['by'],
-                ascending=config.get('ascending', True)
-            )
+            by = (config['by'],)
+            ascending = (config.get('ascending', True),)
         
-        #sorted_df = round_df(sorted_df)
-        results[key] = sorted_df.head(n)
+        min_plays = config.get('min_plays') if min_plays_filter else None
+        results[key] = df.iloc[ranks.top(by, ascending, n, min_plays)]
     
     return results
 
 def top_songs(df, show_uri=True, config=None):
+    return rank_songs(dfAnalytics(df), show_uri=show_uri, config=config)
+
+def rank_songs(song_sum, show_uri=True, config=None):
     if config is None:
         config = Config()
     
-    song_sum = dfAnalytics(df)
-    song_sum = reorganiseColumns(song_sum, TOP_SONG_COLUMN_ORDER)
-
-    if not show_uri:
-        song_sum = song_sum.drop(columns=['spotify_track_uri'])
-    
     sort_configs = {
         'by_plays': {'by': 'total_plays', 'ascending': False},
         'by_no_skips': {'by': 'plays_no_skips', 'ascending': False},
@@ -304,9 +384,17 @@ def top_songs(df, show_uri=True, config=None):
     }
     
     top_results = get_top_n(song_sum, sort_configs, n=config.top_n, min_plays_filter=True)
+
+    def present(table):
+        table = reorganiseColumns(table, TOP_SONG_COLUMN_ORDER)
+        if not show_uri:
+            table = table.drop(columns=['spotify_track_uri'])
+        return table
+
+    top_results = {key: present(table) for key, table in top_results.items()}
     
     return TopResults(
-        all_data=song_sum,
+        all_data=present(song_sum),
         by_plays=top_results['by_plays'],
         by_no_skips=top_results['by_no_skips'],
         by_minutes=top_results['by_minutes'],
@@ -315,27 +403,16 @@ def top_songs(df, show_uri=True, config=None):
         highest_skip=top_results['highest_skip']
     )
 
-@st.cache_data
 def artistAnalytics(df):
-    base_agg = aggregate_by(
-        df,
-        group_col='master_metadata_album_artist_name',
-        name_cols={
-            'unique_tracks': ('master_metadata_track_name', 'nunique'),
-            'unique_albums': ('master_metadata_album_album_name', 'nunique')
-        }
-    )
-    
-    base_agg = base_agg.rename(columns={'master_metadata_album_artist_name': 'artist_name'})
-    
-    return base_agg
+    return levelAnalytics(df).artists
 
 def top_artists(df, config=None):
+    return rank_artists(artistAnalytics(df), config=config)
+
+def rank_artists(artist_sum, config=None):
     if config is None:
         config = Config()
     
-    artist_sum = artistAnalytics(df)
-    
     sort_configs = {
         'by_plays': {'by': 'total_plays', 'ascending': False},
         'by_no_skips': {'by': 'plays_no_skips', 'ascending': False},
@@ -365,34 +442,22 @@ def top_artists(df, config=None):
         highest_skip=top_results['highest_skip']
     )
 
-@st.cache_data
 def albumAnalytics(df):
-    base_agg = aggregate_by(
-        df,
-        group_col='master_metadata_album_album_name',
-        name_cols={
-            'unique_tracks': ('master_metadata_track_name', 'nunique'),
-            'artist_name': ('master_metadata_album_artist_name', 'first')   
-        }
-    )
-
-    base_agg = base_agg.rename(columns={'master_metadata_album_album_name': 'album_name'})
-
-    return base_agg
+    return levelAnalytics(df).albums
 
 def top_albums(df, config=None, single=False):
+    return rank_albums(albumAnalytics(df), config=config, single=single)
+
+def rank_albums(album_sum, config=None, single=False):
     if config is None:
         config = Config()
     
-    album_sum = albumAnalytics(df)
-    album_sum = reorganiseColumns(album_sum, TOP_ALBUM_COLUMN_ORDER)
-
     if single:
         sort_configs = {
             'by_plays': {'by': 'total_plays', 'ascending': False}
         }
         top_results = get_top_n(album_sum, sort_configs, n=len(album_sum), min_plays_filter=True)
-        return top_results['by_plays']
+        return reorganiseColumns(top_results['by_plays'], TOP_ALBUM_COLUMN_ORDER)
     else:
         sort_configs = {
             'by_plays': {'by': 'total_plays', 'ascending': False},
@@ -411,9 +476,10 @@ def top_albums(df, config=None, single=False):
             }
         }
         top_results = get_top_n(album_sum, sort_configs, n=Config.top_n, min_plays_filter=True)
+        top_results = {key: reorganiseColumns(table, TOP_ALBUM_COLUMN_ORDER) for key, table in top_results.items()}
 
     return TopArtistResults(
-        all_data=album_sum,
+        all_data=reorganiseColumns(album_sum, TOP_ALBUM_COLUMN_ORDER),
         by_plays=top_results['by_plays'],
         by_no_skips=top_results['by_no_skips'],
         by_time=top_results['by_time'],
@@ -422,31 +488,31 @@ def top_albums(df, config=None, single=False):
         highest_skip=top_results['highest_skip']
     )
 
-def get_album_hist(df, album_name, exact=False):
-    album_hist = filter_dataframe(df, 'master_metadata_album_album_name', album_name, exact)
+def get_album_hist(df, album_name, exact=False, index=None):
+    album_hist = filter_dataframe(df, 'master_metadata_album_album_name', album_name, exact, index)
     unique_albums = album_hist['master_metadata_album_album_name'].nunique()
 
     if unique_albums > 1:
         found_albums = (
-            album_hist.groupby('master_metadata_album_album_name')
+            album_hist.groupby('master_metadata_album_album_name', observed=True)
             .size()
             .reset_index(name='Listens')
             .rename(columns={
                 "master_metadata_album_album_name": "Album",
             })
         )
-        st.write(f"Found Multiple ({unique_albums}) Albums - please refine your search")
-        st.dataframe(found_albums.sort_values('Listens', ascending=False), width='stretch', hide_index=True)
-        return None
+        return AmbiguousMatch(f"Found Multiple ({unique_albums}) Albums - please refine your search", found_albums.sort_values('Listens', ascending=False))
     elif album_hist.empty:
-        st.write(f"Could not find an album containing '{album_name}'")
-        return None
+        return NoMatch(f"Could not find an album containing '{album_name}'")
     else:
         return album_hist
     
-def artist_album_sum_stats(df, artist=False, album=False):
-    df['ts'] = pd.to_datetime(df['ts'])
-    df = df.sort_values('ts')
+def artist_album_sum_stats(df, artist=False, album=False, entity_stats=None):
+    df = ensure_sorted(df)
+    if entity_stats is not None:
+        stats = entity_stats.artist_album_stats(df, artist, album)
+        if stats is not None:
+            return stats
     
     tot_plays = len(df)
     tot_mins = df['ms_played'].sum() / MS_MIN_CONVERSION
@@ -456,25 +522,26 @@ def artist_album_sum_stats(df, artist=False, album=False):
     first_row = df.iloc[0]
     last_row = df.iloc[-1]
 
-    df['month_year'] = df['ts'].dt.to_period('M')
-    peak_month = df['month_year'].value_counts().idxmax()
-    peak_month_count = df['month_year'].value_counts().max()
+    month_year = df['ts'].dt.to_period('M')
+    peak_month = month_year.value_counts().idxmax()
+    peak_month_count = month_year.value_counts().max()
 
-    df['date'] = df['ts'].dt.to_period('D')
-    most_plays_in_day_date = df['date'].value_counts().idxmax()
-    most_plays_in_day = df['date'].value_counts().max()
+    date = df['ts'].dt.to_period('D')
+    most_plays_in_day_date = date.value_counts().idxmax()
+    most_plays_in_day = date.value_counts().max()
 
     timespan = (df['ts'].iloc[-1] - df['ts'].iloc[0]).days
     avg_plays_per_month = tot_plays / (max(timespan, 1) / DAYS_PER_MONTH)
 
     years_active = df['ts'].dt.year.nunique()
 
-    full_hist = df.groupby('master_metadata_track_name').agg({
+    full_hist = df.groupby('master_metadata_track_name', observed=True).agg({
         'ts': 'count',
         'ms_played': 'sum',
-        'master_metadata_album_album_name': 'first',
-        'skipped': lambda x: (x == False).sum()
-    }).reset_index().rename(columns={
+        'master_metadata_album_album_name': 'first'
+    })
+    full_hist['skipped'] = df['skipped'].eq(False).groupby(df['master_metadata_track_name'], observed=True).sum()
+    full_hist = full_hist.reset_index().rename(columns={
         'master_metadata_track_name': 'Song',
         'ts': 'Listens',
         'master_metadata_album_album_name': 'Album',
@@ -513,21 +580,66 @@ def artist_album_sum_stats(df, artist=False, album=False):
         avg_plays_per_month=avg_plays_per_month
     )
 
-@st.cache_data
+# Plays per (active day, hour): the days since the epoch, each play's day position and the
+# len(days) x 24 count matrix. Any date range's histograms are sums over a slice of it.
+def hour_slab(df):
+    ns = df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    days, day_idx = np.unique(ns // NS_PER_DAY, return_inverse=True)
+    hours = (ns // NS_PER_HOUR) % 24
+    return days, day_idx, np.bincount(day_idx * 24 + hours, minlength=len(days) * 24).reshape(len(days), 24)
+
+# Hour, weekday, day of month and month histograms plus the weekday x hour matrix, from the
+# per-day slab; the calendar fields are worked out once per day rather than per play
+def histograms_from_slab(days, hour_counts):
+    dates = days.astype('datetime64[D]')
+    months = dates.astype('datetime64[M]')
+    weekdays = (days + 3) % 7
+    per_day = hour_counts.sum(axis=1)
+    cells = (weekdays[:, None] * 24 + np.arange(24)).ravel()
+    hour_weekday = np.bincount(cells, weights=hour_counts.ravel(), minlength=7 * 24).astype(np.int64).reshape(7, 24)
+    return TemporalHistograms(
+        hours=hour_weekday.sum(axis=0),
+        weekdays=hour_weekday.sum(axis=1),
+        days_of_month=np.bincount((dates - months).astype(np.int64), weights=per_day, minlength=31).astype(np.int64),
+        months=np.bincount(months.astype(np.int64) % 12, weights=per_day, minlength=12).astype(np.int64),
+        hour_weekday=hour_weekday
+    )
+
+@cached
+def temporal_histograms(df):
+    days, _, hour_counts = hour_slab(df)
+    return histograms_from_slab(days, hour_counts)
+
+def polar_data_from_histograms(histograms):
+    def played(counts, first):
+        counts = pd.Series(counts, index=np.arange(first, first + len(counts)))
+        return counts[counts > 0]
+
+    return polar_data_from_counts(
+        played(histograms.hours, 0),
+        played(histograms.weekdays, 0),
+        played(histograms.days_of_month, 1),
+        played(histograms.months, 1)
+    )
+
+@cached
 def get_data_for_polar_plots(df):
-    hourly_counts = df['ts'].dt.hour.value_counts().sort_index().reset_index()
+    return polar_data_from_histograms(temporal_histograms(df))
+
+def polar_data_from_counts(hour_counts, weekday_counts, day_of_month_counts, month_counts):
+    hourly_counts = hour_counts.sort_index().reset_index()
     hourly_counts.columns = ['hour', 'count']
     hourly_counts['hour'] = hourly_counts['hour'].astype(str) + ":00"
 
-    daily_counts_week = df['ts'].dt.dayofweek.value_counts().sort_index().reset_index()
+    daily_counts_week = weekday_counts.sort_index().reset_index()
     daily_counts_week.columns = ['day', 'count']
     daily_counts_week['day'] = daily_counts_week['day'].map(DAYS_OF_WEEK)
 
-    daily_counts_month = df['ts'].dt.day.value_counts().sort_index().reset_index()
+    daily_counts_month = day_of_month_counts.sort_index().reset_index()
     daily_counts_month.columns = ['day', 'count']
     daily_counts_month['day'] = daily_counts_month['day'].apply(lambda x: str(x) + DATE_SUFFIX[x])
     
-    monthly_counts = df['ts'].dt.month.value_counts().sort_index().reset_index()
+    monthly_counts = month_counts.sort_index().reset_index()
     monthly_counts.columns = ['month', 'count']
     monthly_counts['month'] = monthly_counts['month'].map(MONTHS)
 
@@ -536,4 +648,6 @@ def get_data_for_polar_plots(df):
         daily_counts_week=daily_counts_week,
         daily_counts_month=daily_counts_month,
         monthly_counts=monthly_counts
-    )
\ No newline at end of file
+    )
+
+instrument.instrument_module(globals())
@@ -0,0 +1,88 @@
+import io
+import re
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# A saved dataset is a zip of one parquet file per year (year=2021/part-0.parquet), each
+# sorted by ts and split into row groups with min/max statistics, so a load can skip the
+# years, row groups and columns it doesn't need. Fewer, larger groups read faster, and a
+# year of plays is usually only one or two groups.
+ROW_GROUP_ROWS = 32768
+PART_NAME = 'year={year}/part-0.parquet'
+PART_PATTERN = re.compile(r'year=(\d{4})/part-0\.parquet$')
+
+def write_archive(df, target):
+    years = df['ts'].dt.year
+    # Parquet is already compressed, and stored members can be seeked without inflating
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for year, part in df.groupby(years, sort=True):
+            part = part.sort_values('ts', kind='stable')
+            buffer = io.BytesIO()
+            pq.write_table(
+                pa.Table.from_pandas(part, preserve_index=False),
+                buffer,
+                row_group_size=ROW_GROUP_ROWS,
+                compression='zstd',
+                write_statistics=True
+            )
+            zf.writestr(PART_NAME.format(year=year), buffer.getvalue())
+    return target
+
+def _parts(zf):
+    parts = {}
+    for name in zf.namelist():
+        match = PART_PATTERN.search(name)
+        if match:
+            parts[int(match.group(1))] = name
+    return dict(sorted(parts.items()))
+
+def archive_years(source):
+    with zipfile.ZipFile(source) as zf:
+        return list(_parts(zf))
+
+def _row_groups(parquet_file, start, end):
+    metadata = parquet_file.metadata
+    ts_index = parquet_file.schema_arrow.get_field_index('ts')
+    groups = []
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(ts_index).statistics
+        if stats is None or not stats.has_min_max:
+            groups.append(i)
+            continue
+        if (end is None or pd.Timestamp(stats.min) < end) and (start is None or pd.Timestamp(stats.max) >= start):
+            groups.append(i)
+    return groups
+
+# Plays with start <= ts < end (either bound optional), reading only the overlapping
+# years and row groups, and only the given columns
+def read_archive(source, start=None, end=None, columns=None):
+    if columns is not None and 'ts' not in columns:
+        columns = ['ts'] + list(columns)
+    tables = []
+    with zipfile.ZipFile(source) as zf:
+        for year, name in _parts(zf).items():
+            if (start is not None and year < start.year) or (end is not None and year > (end - pd.Timedelta(1)).year):
+                continue
+            with zf.open(name) as f:
+                parquet_file = pq.ParquetFile(f)
+                file_columns = None if columns is None else [col for col in columns if col in parquet_file.schema_arrow.names]
+                groups = _row_groups(parquet_file, start, end)
+                if groups:
+                    tables.append(parquet_file.read_row_groups(groups, columns=file_columns, use_pandas_metadata=True))
+
+    if not tables:
+        raise ValueError('No plays in the saved dataset for this date range')
+    # One dictionary per categorical column across years, converted to pandas once
+    table = pa.concat_tables(tables).unify_dictionaries()
+    mask = None
+    for bound, compare in [(start, pc.greater_equal), (end, pc.less)]:
+        if bound is not None:
+            keep = compare(table['ts'], pa.scalar(bound, type=table.schema.field('ts').type))
+            mask = keep if mask is None else pc.and_(mask, keep)
+    if mask is not None:
+        table = table.filter(mask)
+    return table.to_pandas()
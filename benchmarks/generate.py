@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SYLLABLES = ['la', 'mo', 'ri', 'ka', 'ne', 'so', 'tu', 'vi', 'da', 'pe', 'lo', 'shi', 'ra', 'en', 'ul',
+             'gor', 'fen', 'mar', 'lin', 'tor', 'bel', 'ash', 'ny', 'qu', 'zel', 'dor', 'ix', 'ou', 'ae', 'ym']
+PLATFORMS = ['android', 'ios', 'windows', 'osx', 'web_player', 'cast_to_device']
+COUNTRIES = ['GB', 'US', 'DE', 'FR', 'ES', 'NL', 'SE', 'IE']
+IP_ADDRS = ['81.2.69.142', '81.2.69.160', '2.125.160.216', '86.1.3.9']
+REASONS_START = ['trackdone', 'clickrow', 'fwdbtn', 'playbtn', 'appload', 'backbtn']
+REASONS_END = ['trackdone', 'fwdbtn', 'endplay', 'logout', 'backbtn']
+SHOWS = ['The Daily Show', 'Tech Weekly', 'History Hour']
+# Relative listens per hour of day (UTC)
+HOUR_WEIGHTS = np.array([2, 1, 1, 1, 1, 2, 4, 7, 9, 7, 6, 6, 7, 6, 6, 7, 8, 9, 9, 8, 7, 6, 4, 3], dtype=float)
+TRACK_ZIPF = 1.25
+ARTIST_ZIPF = 1.6
+SKIP_RATE = 0.15
+PODCAST_SHARE = 0.02
+ALIAS_SHARE = 0.03
+OFFLINE_SHARE = 0.05
+URI_ALPHABET = np.array(list('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'))
+ROWS_PER_FILE = 16000
+MAX_TRACKS = 200000
+
+def _words(rng, n):
+    syllables = rng.integers(0, len(SYLLABLES), size=(n, 3))
+    lengths = rng.integers(1, 4, size=n)
+    return [''.join(SYLLABLES[s] for s in row[:length]).capitalize() for row, length in zip(syllables, lengths)]
+
+def _titles(rng, vocabulary, n, max_words):
+    counts = rng.integers(1, max_words + 1, size=n)
+    picks = rng.integers(0, len(vocabulary), size=counts.sum())
+    ends = np.cumsum(counts)
+    return [' '.join(vocabulary[i] for i in picks[end - count:end]) for count, end in zip(counts, ends)]
+
+def _uris(rng, n, kind):
+    chars = URI_ALPHABET[rng.integers(0, len(URI_ALPHABET), size=(n, 22))]
+    return [f'spotify:{kind}:' + ''.join(row) for row in chars]
+
+# Names are random titles and can repeat, so dedupe them before building the categorical
+def _categorical(names, codes, missing=None):
+    name_codes, categories = pd.factorize(np.asarray(names, dtype=object))
+    codes = name_codes[codes]
+    if missing is not None:
+        codes = np.where(missing, -1, codes)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def _catalog(rng, rows):
+    n_tracks = int(np.clip(rows // 40, 200, MAX_TRACKS))
+    n_artists = max(20, n_tracks // 12)
+    vocabulary = _words(rng, 3000)
+
+    # Popular artists have more tracks, spread over up to four albums each
+    track_artist = (rng.zipf(ARTIST_ZIPF, n_tracks) - 1) % n_artists
+    album_keys, track_album = np.unique(track_artist * 4 + rng.integers(0, 4, n_tracks), return_inverse=True)
+    album_names = _titles(rng, vocabulary, len(album_keys), 3)
+
+    return {
+        'tracks': _titles(rng, vocabulary, n_tracks, 4),
+        'artists': _titles(rng, vocabulary, n_artists, 2),
+        # Re-releases get a second URI whose album is the deluxe edition
+        'albums': album_names + [name + ' (Deluxe Edition)' for name in album_names],
+        'uris': _uris(rng, 2 * n_tracks, 'track'),
+        'track_artist': track_artist,
+        'track_album': track_album,
+        'has_alias': rng.random(n_tracks) < ALIAS_SHARE,
+        'track_length_ms': rng.integers(90000, 360000, n_tracks),
+        'episodes': _titles(rng, vocabulary, 60, 5),
+        'episode_uris': _uris(rng, 60, 'episode')
+    }
+
+# A raw Extended Streaming History frame with the export's columns. String columns are
+# categoricals so tens of millions of rows fit in memory; the same seed gives the same frame.
+def generate_frame(rows, seed=0, start='2015-01-01', years=8):
+    rng = np.random.default_rng(seed)
+    catalog = _catalog(rng, rows)
+    n_tracks = len(catalog['tracks'])
+    n_albums = len(catalog['albums']) // 2
+
+    start_s = pd.Timestamp(start, tz='UTC').value // 10**9
+    days = rng.integers(0, int(years * 365.25), rows)
+    hours = rng.choice(24, size=rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    ts_s = np.sort(start_s + days * 86400 + hours * 3600 + rng.integers(0, 3600, rows))
+
+    track = (rng.zipf(TRACK_ZIPF, rows) - 1) % n_tracks
+    podcast = rng.random(rows) < PODCAST_SHARE
+    alias = catalog['has_alias'][track] & (rng.random(rows) < 0.3)
+    album = catalog['track_album'][track] + np.where(alias, n_albums, 0)
+    skipped = rng.random(rows) < SKIP_RATE
+    offline = rng.random(rows) < OFFLINE_SHARE
+    episode = rng.integers(0, len(catalog['episodes']), rows)
+
+    full_play = (catalog['track_length_ms'][track] * rng.uniform(0.85, 1.0, rows)).astype(np.int64)
+    ms_played = np.where(skipped, rng.integers(0, 30000, rows), full_play)
+    ms_played = np.where(podcast, rng.integers(60000, 3600000, rows), ms_played)
+    reason_end = np.where(skipped, REASONS_END.index('fwdbtn'), rng.integers(0, len(REASONS_END), rows))
+
+    no_audiobook = np.ones(rows, dtype=bool)
+    return pd.DataFrame({
+        'ts': pd.to_datetime(ts_s, unit='s', utc=True).as_unit('ns'),
+        'platform': _categorical(PLATFORMS, rng.integers(0, len(PLATFORMS), rows)),
+        'ms_played': ms_played,
+        'conn_country': _categorical(COUNTRIES, rng.integers(0, len(COUNTRIES), rows)),
+        'ip_addr': _categorical(IP_ADDRS, rng.integers(0, len(IP_ADDRS), rows)),
+        'master_metadata_track_name': _categorical(catalog['tracks'], track, podcast),
+        'master_metadata_album_artist_name': _categorical(catalog['artists'], catalog['track_artist'][track], podcast),
+        'master_metadata_album_album_name': _categorical(catalog['albums'], album, podcast),
+        'spotify_track_uri': _categorical(catalog['uris'], track + np.where(alias, n_tracks, 0), podcast),
+        'episode_name': _categorical(catalog['episodes'], episode, ~podcast),
+        'episode_show_name': _categorical(SHOWS, episode % len(SHOWS), ~podcast),
+        'spotify_episode_uri': _categorical(catalog['episode_uris'], episode, ~podcast),
+        'audiobook_title': _categorical([''], np.zeros(rows, dtype=np.int64), no_audiobook),
+        'audiobook_uri': _categorical([''], np.zeros(rows, dtype=np.int64), no_audiobook),
+        'audiobook_chapter_uri': _categorical([''], np.zeros(rows, dtype=np.int64), no_audiobook),
+        'audiobook_chapter_title': _categorical([''], np.zeros(rows, dtype=np.int64), no_audiobook),
+        'reason_start': _categorical(REASONS_START, rng.integers(0, len(REASONS_START), rows)),
+        'reason_end': _categorical(REASONS_END, reason_end),
+        'shuffle': rng.random(rows) < 0.4,
+        'skipped': skipped,
+        'offline': offline,
+        'offline_timestamp': ts_s * 1000 - np.where(offline, rng.integers(0, 86400000, rows), 0),
+        'incognito_mode': rng.random(rows) < 0.01
+    })
+
+def _json_value(value):
+    if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _records(chunk):
+    columns = {col: chunk[col].astype(object).to_numpy() for col in chunk.columns}
+    columns['ts'] = chunk['ts'].dt.strftime('%Y-%m-%dT%H:%M:%SZ').to_numpy()
+    names = list(columns)
+    return [dict(zip(names, (_json_value(v) for v in values))) for values in zip(*columns.values())]
+
+# Split into Streaming_History_Audio_<first year>-<last year>_<n>.json files like the export
+def write_json(df, directory, rows_per_file=ROWS_PER_FILE):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, offset in enumerate(range(0, len(df), rows_per_file)):
+        chunk = df.iloc[offset:offset + rows_per_file]
+        years = chunk['ts'].dt.year
+        path = os.path.join(directory, f'Streaming_History_Audio_{years.iloc[0]}-{years.iloc[-1]}_{i}.json')
+        with open(path, 'w') as f:
+            json.dump(_records(chunk), f)
+        paths.append(path)
+    return paths
+
+def write_parquet(df, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df.to_parquet(path, index=False)
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic Spotify Extended Streaming History')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--out', default='benchmarks/data')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['json', 'parquet', 'both'], default='both')
+    args = parser.parse_args()
+
+    df = generate_frame(args.rows, seed=args.seed)
+    if args.format in ('json', 'both'):
+        paths = write_json(df, os.path.join(args.out, f'json_{args.rows}'))
+        print(f'Wrote {len(paths)} JSON files to {os.path.dirname(paths[0])}')
+    if args.format in ('parquet', 'both'):
+        print(f"Wrote {write_parquet(df, os.path.join(args.out, f'history_{args.rows}.parquet'))}")
@@ -0,0 +1,190 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyticsFuncs
+import archive
+import ingest
+import plots
+import timeseries
+from benchmarks.generate import generate_frame, write_json, write_parquet
+from compare import GRAINS, available_periods, compare_periods
+from compact import ENTITY_COLUMNS, LOW_CARDINALITY_COLUMNS, STRING_DTYPE, memory_usage
+from dataset import Dataset
+from entitystats import EntityStats
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+JSON_MAX_ROWS = 1000000
+REGRESSION_THRESHOLD = 1.25
+# Timings under this are dominated by noise and never flagged
+MIN_COMPARE_SECONDS = 0.05
+
+def _time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _peak_mb(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def _measure(results, name, func, repeat, memory):
+    seconds, result = _time(func, repeat)
+    results[name] = {'seconds': round(seconds, 6)}
+    if memory:
+        results[name]['peak_mb'] = round(_peak_mb(func), 3)
+    print(f"  {name:<28} {seconds:9.4f}s" + (f"  {results[name]['peak_mb']:10.1f} MB" if memory else ''), flush=True)
+    return result
+
+def _upload(paths):
+    df, _ = ingest.load_json_files(paths)
+    df, uri_aliases = ingest.prepare_dataset(df)
+    return Dataset(df, uri_aliases)
+
+def _upload_parquet(path):
+    df, uri_aliases = ingest.prepare_dataset(pd.read_parquet(path))
+    return Dataset(df, uri_aliases)
+
+def _upload_archive(path, start=None):
+    df, uri_aliases = ingest.prepare_dataset(archive.read_archive(path, start=start, columns=list(ingest.INGEST_COLUMNS)))
+    return Dataset(df, uri_aliases)
+
+# In-memory size of the plays with text columns as Python objects, as Arrow-backed strings
+# and as the compacted session dataset
+def storage_mb(raw, df):
+    text_columns = [col for col in list(ENTITY_COLUMNS.values()) + LOW_CARDINALITY_COLUMNS if col in raw]
+    sizes = {
+        'object_strings': memory_usage(raw.astype({col: object for col in text_columns})),
+        'arrow_strings': memory_usage(raw.astype({col: STRING_DTYPE for col in text_columns})),
+        'compact': memory_usage(df)
+    }
+    for name, size in sizes.items():
+        print(f"  {'memory ' + name:<28} {size / 1e6:9.1f} MB", flush=True)
+    return {name: round(size / 1e6, 3) for name, size in sizes.items()}
+
+# Size of the Daily minutes chart's figure JSON (what st.plotly_chart sends) with every
+# point and with the default point budget
+def chart_payload_kb(df, results, repeat, memory):
+    daily = timeseries.build_time_series(*timeseries.daily_bins(df)).daily.series
+    payload = {'points': len(daily)}
+    for name, max_points in [('full', None), ('downsampled', plots.MAX_LINE_POINTS)]:
+        chart = lambda: plots.line_plot(daily, 'ts', 'minutes', 'Minutes', plots.MINUTE_PLOT_LABELS, max_points).to_json()
+        payload[name] = round(len(_measure(results, f'line_chart_{name}', chart, repeat, memory)) / 1e3, 1)
+        print(f"  {'payload ' + name:<28} {payload[name]:9.1f} KB", flush=True)
+    return payload
+
+# The analytics are timed on the plain frame so the process-wide cache never serves a result
+def bench_size(rows, workdir, repeat=1, memory=True, json_max_rows=JSON_MAX_ROWS, seed=0):
+    print(f'{rows:,} rows', flush=True)
+    results = {}
+    raw = generate_frame(rows, seed=seed)
+
+    if rows <= json_max_rows:
+        paths = write_json(raw, os.path.join(workdir, f'json_{rows}'))
+        _measure(results, 'upload_json', lambda: _upload(paths), 1, memory)
+    parquet_path = write_parquet(raw, os.path.join(workdir, f'history_{rows}.parquet'))
+    dataset = _measure(results, 'upload_parquet', lambda: _upload_parquet(parquet_path), 1, memory)
+    df = dataset.df
+    storage = storage_mb(raw, df)
+    del raw
+    archive_path = archive.write_archive(df, os.path.join(workdir, f'history_{rows}.zip'))
+    _measure(results, 'upload_archive', lambda: _upload_archive(archive_path), 1, memory)
+    last_year = pd.Timestamp(year=df['ts'].iloc[-1].year, month=1, day=1, tz='UTC')
+    _measure(results, 'upload_archive_last_year', lambda: _upload_archive(archive_path, last_year), 1, memory)
+
+    _measure(results, 'basicStats', lambda: analyticsFuncs.basicStats(df), repeat, memory)
+    songs = _measure(results, 'top_songs', lambda: analyticsFuncs.top_songs(df), repeat, memory)
+    artists = _measure(results, 'top_artists', lambda: analyticsFuncs.top_artists(df), repeat, memory)
+    _measure(results, 'top_albums', lambda: analyticsFuncs.top_albums(df), repeat, memory)
+
+    artist_name = artists.by_plays['artist_name'].iloc[0]
+    artist_hist = df[df[ENTITY_COLUMNS['artist']] == artist_name]
+    _measure(results, 'artist_album_sum_stats', lambda: analyticsFuncs.artist_album_sum_stats(artist_hist, artist=True), repeat, memory)
+
+    top_uri = songs.by_plays['spotify_track_uri'].iloc[0]
+    song_history = df[df[ENTITY_COLUMNS['uri']] == top_uri]
+    _measure(results, 'song_sum_stats', lambda: analyticsFuncs.song_sum_stats(song_history), repeat, memory)
+
+    _measure(results, 'get_data_for_polar_plots', lambda: analyticsFuncs.get_data_for_polar_plots(df), repeat, memory)
+    _measure(results, 'time_series', lambda: timeseries.build_time_series(*timeseries.daily_bins(df)), repeat, memory)
+    _measure(results, 'EntityStats', lambda: EntityStats(df, dataset.rollup), repeat, memory)
+    years = available_periods(*dataset.full_range(), GRAINS['Year'])
+    _measure(results, 'compare_years', lambda: compare_periods(dataset.rollup, years), repeat, memory)
+    payload = chart_payload_kb(df, results, repeat, memory)
+    return results, storage, payload
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__
+    }
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for size, stages in report['results'].items():
+        for stage, result in stages.items():
+            before = baseline['results'].get(size, {}).get(stage)
+            if before is None or before['seconds'] < MIN_COMPARE_SECONDS:
+                continue
+            ratio = result['seconds'] / before['seconds']
+            if ratio > threshold:
+                regressions.append({'rows': size, 'stage': stage, 'before': before['seconds'], 'after': result['seconds'], 'ratio': round(ratio, 3)})
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time and memory-profile the dashboard on synthetic histories')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json-max-rows', type=int, default=JSON_MAX_ROWS, help='largest size to also time the JSON upload for')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmarks/report.json')
+    parser.add_argument('--compare', help='baseline report; exits non-zero if any stage is slower by more than --threshold')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore', message='Converting to PeriodArray')
+
+    report = {'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'results': {}, 'storage_mb': {}, 'chart_payload_kb': {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.sizes:
+            report['results'][str(rows)], report['storage_mb'][str(rows)], report['chart_payload_kb'][str(rows)] = bench_size(rows, workdir, args.repeat, not args.no_memory, args.json_max_rows, args.seed)
+
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {args.out}')
+
+    for regression in report.get('regressions', []):
+        print(f"REGRESSION {regression['rows']} rows {regression['stage']}: {regression['before']:.4f}s -> {regression['after']:.4f}s (x{regression['ratio']})")
+    if report.get('regressions'):
+        sys.exit(1)
@@ -0,0 +1,140 @@
+import dataclasses
+import functools
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import instrument
+from models import CacheInfo, ViewKey
+
+CACHE_MAX_ENTRIES = 256
+
+# A slice of a dataset plus the small key that identifies it. Cached analytics are keyed
+# by the key, so the frame itself is never hashed.
+class DataView:
+    def __init__(self, df, key):
+        self.df = df
+        self.key = key
+
+    def __len__(self):
+        return len(self.df)
+
+# Approximate in-memory size of a cached result
+def sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, bytes):
+        return len(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sum(sizeof(getattr(value, field.name)) for field in dataclasses.fields(value))
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(sizeof(item) for item in value.values())
+    return sys.getsizeof(value)
+
+def _fingerprints(key):
+    if isinstance(key, ViewKey):
+        yield key.fingerprint
+    elif isinstance(key, tuple):
+        for part in key:
+            yield from _fingerprints(part)
+
+class AnalyticsCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Called after every put, e.g. by the dataset registry to apply its memory budget
+        self.after_put = None
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return True, self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def _remove(self, key):
+        del self.entries[key]
+        self.bytes -= self.sizes.pop(key)
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.bytes += size
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+        if self.after_put is not None:
+            self.after_put()
+
+    # Drops the least recently used entry; False if there was none
+    def evict_oldest(self):
+        with self.lock:
+            if not self.entries:
+                return False
+            self._remove(next(iter(self.entries)))
+            return True
+
+    # Drops every entry computed from the dataset with this fingerprint
+    def discard(self, fingerprint):
+        with self.lock:
+            for key in [key for key in self.entries if fingerprint in _fingerprints(key)]:
+                self._remove(key)
+
+    def info(self):
+        return CacheInfo(hits=self.hits, misses=self.misses, entries=len(self.entries), bytes=self.bytes)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.bytes = 0
+            self.hits = self.misses = 0
+
+CACHE = AnalyticsCache()
+
+def memoize(key, func, *args, **kwargs):
+    found, value = CACHE.get(key)
+    instrument.record_cache(found)
+    if found:
+        return value
+    value = func(*args, **kwargs)
+    CACHE.put(key, value)
+    return value
+
+# Caches func on DataView arguments by (function, view key, other args).
+# Plain DataFrames are computed directly, as there is no cheap key for them.
+def cached(func):
+    @functools.wraps(func)
+    def wrapper(data, *args, **kwargs):
+        if not isinstance(data, DataView):
+            return func(data, *args, **kwargs)
+
+        key = (func.__qualname__, data.key, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(data.df, *args, **kwargs)
+
+        return memoize(key, func, data.df, *args, **kwargs)
+    return wrapper
+
+def cache_info():
+    return CACHE.info()
@@ -0,0 +1,211 @@
+import argparse
+import dataclasses
+import glob
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+import analyticsFuncs
+import archive
+import compare
+import ingest
+import rollup
+from compact import concat_compact
+from dataset import Dataset
+from models import DAYS_OF_WEEK, AmbiguousMatch, NoMatch
+
+FORMATS = ['json', 'csv', 'parquet']
+ENTITY_LOOKUPS = {
+    'track': lambda ds, name, exact, artist: analyticsFuncs.get_song_stats(ds.df, name, exact=exact, artist=artist, index=ds.search_index),
+    'artist': lambda ds, name, exact, artist: analyticsFuncs.get_artist_hist(ds.df, name, exact=exact, index=ds.search_index),
+    'album': lambda ds, name, exact, artist: analyticsFuncs.get_album_hist(ds.df, name, exact=exact, index=ds.search_index)
+}
+
+SAVED_SUFFIXES = ('.zip', '.parquet')
+
+def _input_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.json')) + glob.glob(os.path.join(path, '*.zip')) + glob.glob(os.path.join(path, '*.parquet')))
+        else:
+            files.append(path)
+    return files
+
+def _read_saved(path, since=None, until=None):
+    if path.endswith('.zip'):
+        return archive.read_archive(path, start=since, end=until, columns=list(ingest.INGEST_COLUMNS))
+    return pd.read_parquet(path)
+
+# A saved .zip dataset is only read between since and until
+def load_dataset(paths, since=None, until=None):
+    files = _input_files(paths)
+    saved_files = [f for f in files if f.endswith(SAVED_SUFFIXES)]
+    json_files = [f for f in files if not f.endswith(SAVED_SUFFIXES)]
+    if saved_files:
+        frames = [_read_saved(f, since, until) for f in saved_files]
+        df = concat_compact(frames) if len(frames) > 1 else frames[0]
+    else:
+        df, _ = ingest.load_json_files(json_files)
+        json_files = []
+    df, uri_aliases = ingest.prepare_dataset(df)
+    ds = Dataset(df, uri_aliases)
+    # JSON alongside a saved dataset is a newer export, merged in without duplicating plays
+    if json_files:
+        ds, _ = ds.append(ingest.load_json_files(json_files)[0])
+    return ds
+
+def _plain(value):
+    if isinstance(value, (pd.Timestamp, pd.Period)):
+        return str(value)
+    if isinstance(value, pd.Series):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value
+
+# Splits a result dataclass into JSON-safe scalars and its DataFrame fields
+def _split(result, prefix):
+    summary, tables = {}, {}
+    for field in dataclasses.fields(result):
+        value = getattr(result, field.name)
+        if isinstance(value, pd.DataFrame):
+            tables[f'{prefix}.{field.name}'] = value
+        else:
+            summary[field.name] = _plain(value)
+    return summary, tables
+
+def home_report(ds, start=None, end=None):
+    first, last = ds.full_range()
+    start = first if start is None else start
+    end = last if end is None else end
+    summaries = ds.range_summaries(start, end)
+
+    report = {'start': str(start.date()), 'end': str(end.date())}
+    report['basic_stats'], tables = _split(rollup.basic_stats(ds.rollup, start, end), 'home.basic_stats')
+    report['first_last_play'], _ = _split(analyticsFuncs.firstLastPlay(ds.time_index.slice(ds.df, start, end)), 'home.first_last_play')
+    for name, result in [
+        ('top_songs', analyticsFuncs.rank_songs(summaries.songs)),
+        ('top_artists', analyticsFuncs.rank_artists(summaries.artists)),
+        ('top_albums', analyticsFuncs.rank_albums(summaries.albums)),
+        ('listening_times', rollup.polar_data(ds.rollup, start, end))
+    ]:
+        tables.update(_split(result, f'home.{name}')[1])
+    histograms = rollup.temporal_histograms(ds.rollup, start, end)
+    tables['home.hour_weekday'] = pd.DataFrame(histograms.hour_weekday, index=pd.Index(list(DAYS_OF_WEEK.values()), name='day'), columns=[f'{hour}:00' for hour in range(24)]).reset_index()
+    return report, tables
+
+def comparison_report(ds, periods):
+    comparison = ds.compare(periods)
+    summary = {'periods': [{'label': period.label, 'start': str(period.start.date()), 'end': str(period.end.date())} for period in periods]}
+    tables = {'compare.totals': comparison.totals}
+    for name in ['songs', 'artists', 'albums']:
+        level = getattr(comparison, name)
+        tables[f'compare.{name}'] = level.table
+        tables[f'compare.{name}.ranks'] = level.ranks
+    return summary, tables
+
+# A track can be narrowed to one artist, as track names are often shared
+def entity_report(ds, entity, name, exact=False, artist=None):
+    result = ENTITY_LOOKUPS[entity](ds, name, exact, artist)
+    prefix = f'{entity}.{name}' if artist is None else f'{entity}.{name} - {artist}'
+    if isinstance(result, NoMatch):
+        return {'status': 'not_found', 'message': result.message}, {}
+    if isinstance(result, AmbiguousMatch):
+        return {'status': 'ambiguous', 'message': result.message}, {f'{prefix}.matches': result.matches}
+
+    if entity == 'track':
+        stats = analyticsFuncs.song_sum_stats(result, entity_stats=ds.entity_stats)
+    else:
+        stats = analyticsFuncs.artist_album_sum_stats(result, artist=entity == 'artist', album=entity == 'album', entity_stats=ds.entity_stats)
+    summary, tables = _split(stats, prefix)
+    summary['status'] = 'ok'
+    return summary, tables
+
+# Lookups for the N most played tracks, artists and albums, as (entity, name, exact, artist)
+def top_entity_lookups(ds, n):
+    summaries = ds.range_summaries(*ds.full_range())
+    top_songs = analyticsFuncs.rank_songs(summaries.songs).by_plays.head(n)
+    lookups = [('track', row.track_name, True, row.artist_name) for row in top_songs.itertuples()]
+    lookups += [('artist', name, True, None) for name in analyticsFuncs.rank_artists(summaries.artists).by_plays['artist_name'].head(n)]
+    lookups += [('album', name, True, None) for name in analyticsFuncs.rank_albums(summaries.albums).by_plays['album_name'].head(n)]
+    return lookups
+
+def build_report(ds, start=None, end=None, lookups=(), entity_tables=False, periods=()):
+    summary, tables = home_report(ds, start, end)
+    report = {'rows': len(ds.df), 'fingerprint': ds.fingerprint, 'home': summary}
+    if periods:
+        report['comparison'], comparison_tables = comparison_report(ds, periods)
+        tables.update(comparison_tables)
+    if entity_tables:
+        for entity in ['track', 'artist', 'album']:
+            tables[f'all.{entity}_stats'] = ds.entity_stats.table(entity)
+    for entity, name, exact, artist in lookups:
+        label = name if artist is None else f'{name} - {artist}'
+        report.setdefault(entity, {})[label], lookup_tables = entity_report(ds, entity, name, exact, artist)
+        tables.update(lookup_tables)
+    return report, tables
+
+def _file_name(table_name):
+    return re.sub(r'[^\w.-]+', '_', table_name).strip('_')
+
+def write_report(report, tables, out, fmt='json'):
+    os.makedirs(out, exist_ok=True)
+    if fmt == 'json':
+        report = dict(report, tables={name: json.loads(table.to_json(orient='records', date_format='iso')) for name, table in tables.items()})
+        path = os.path.join(out, 'report.json')
+    else:
+        report = dict(report, tables={name: f'{_file_name(name)}.{fmt}' for name in tables})
+        for name, table in tables.items():
+            path = os.path.join(out, report['tables'][name])
+            if fmt == 'csv':
+                table.to_csv(path, index=False)
+            else:
+                table.to_parquet(path, index=False)
+        path = os.path.join(out, 'summary.json')
+
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute dashboard reports for a Spotify Extended Streaming History without the UI')
+    parser.add_argument('inputs', nargs='+', help='JSON files, saved .zip or .parquet datasets, or directories containing them')
+    parser.add_argument('--out', required=True, help='directory to write the report to')
+    parser.add_argument('--format', choices=FORMATS, default='json')
+    parser.add_argument('--start', type=lambda value: pd.Timestamp(value, tz='UTC'), help='first day of the Home range (YYYY-MM-DD)')
+    parser.add_argument('--end', type=lambda value: pd.Timestamp(value, tz='UTC'), help='day after the Home range (YYYY-MM-DD)')
+    parser.add_argument('--since', type=lambda value: pd.Timestamp(value, tz='UTC'), help='only load plays from this day on from a saved .zip dataset (YYYY-MM-DD)')
+    parser.add_argument('--until', type=lambda value: pd.Timestamp(value, tz='UTC'), help='only load plays before this day from a saved .zip dataset (YYYY-MM-DD)')
+    parser.add_argument('--save', help='also save the loaded dataset as a .zip for faster loading next time')
+    parser.add_argument('--track', action='append', default=[], help='track to report on, may be repeated')
+    parser.add_argument('--artist', action='append', default=[], help='artist to report on, may be repeated')
+    parser.add_argument('--album', action='append', default=[], help='album to report on, may be repeated')
+    parser.add_argument('--top', type=int, default=0, help='also report on the N most played tracks, artists and albums')
+    parser.add_argument('--all-entities', action='store_true', help='also write stats tables covering every track, artist and album')
+    parser.add_argument('--exact', action='store_true', help='names must match exactly')
+    parser.add_argument('--compare', action='append', default=[], type=compare.parse_period, metavar='PERIOD', help='compare this period with the others given (2023, 2023Q1, 2023-01 or 2023-01-01..2023-04-01), may be repeated')
+    args = parser.parse_args(argv)
+    periods = list(dict.fromkeys(args.compare))
+    if len(periods) == 1:
+        parser.error('--compare needs at least two different periods')
+
+    ds = load_dataset(args.inputs, args.since, args.until)
+    if args.save:
+        archive.write_archive(ds.df, args.save)
+    lookups = [(entity, name, args.exact, None) for entity, names in [('track', args.track), ('artist', args.artist), ('album', args.album)] for name in names]
+    if args.top:
+        lookups += top_entity_lookups(ds, args.top)
+
+    report, tables = build_report(ds, args.start, args.end, lookups, args.all_entities, periods)
+    print(f"Wrote {write_report(report, tables, args.out, args.format)} ({len(tables)} tables)")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+ENTITY_COLUMNS = {
+    'track': 'master_metadata_track_name',
+    'artist': 'master_metadata_album_artist_name',
+    'album': 'master_metadata_album_album_name',
+    'uri': 'spotify_track_uri'
+}
+LOW_CARDINALITY_COLUMNS = ['platform', 'conn_country', 'reason_start', 'reason_end']
+BOOL_COLUMNS = ['shuffle', 'skipped', 'offline', 'incognito_mode']
+# Arrow-backed strings (the pandas 3 default) for category names and any other text column,
+# whatever the source: object columns from older parquet files, pyarrow-typed reads ...
+STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+TS_DTYPE = 'datetime64[ns, UTC]'
+
+def _encode(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.cat.remove_unused_categories()
+        if series.cat.categories.dtype != STRING_DTYPE:
+            series = series.cat.rename_categories(series.cat.categories.astype(STRING_DTYPE))
+        return series
+    codes, categories = pd.factorize(series, sort=True)
+    categories = pd.Index(categories).astype(STRING_DTYPE)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=series.index, name=series.name)
+
+def _downcast_bool(series):
+    if series.isna().any():
+        return series.astype('boolean')
+    return series.astype(bool)
+
+def compact_dataset(df):
+    data = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.ArrowDtype) and col != 'ts':
+            # pyarrow-typed reads (dtype_backend='pyarrow') back onto the dtypes the analytics use;
+            # dictionary columns (categoricals saved to parquet) come back as categoricals
+            if pa.types.is_dictionary(series.dtype.pyarrow_dtype):
+                series = pd.Series(pa.array(series.array).to_pandas(), index=series.index, name=col)
+            else:
+                series = series.convert_dtypes(dtype_backend='numpy_nullable')
+        if col in ENTITY_COLUMNS.values() or col in LOW_CARDINALITY_COLUMNS:
+            data[col] = _encode(series)
+        elif col in BOOL_COLUMNS:
+            data[col] = _downcast_bool(series)
+        elif col == 'ms_played':
+            data[col] = pd.to_numeric(series.astype(np.int64), downcast='integer')
+        elif col == 'ts' and series.dtype != TS_DTYPE:
+            # The time index and rollups read ts as a flat int64 nanosecond buffer
+            data[col] = series.astype(TS_DTYPE)
+        elif series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            data[col] = series.astype(STRING_DTYPE)
+        else:
+            data[col] = series
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+# Concatenates compacted frames, unioning categorical columns into one sorted category
+# set so they stay categorical (a plain concat falls back to object for differing sets)
+def concat_compact(frames):
+    columns = frames[0].columns
+    data = {}
+    for col in columns:
+        parts = [frame[col] if col in frame else pd.Series(pd.NA, index=frame.index) for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[col] = pd.api.types.union_categoricals(parts, sort_categories=True)
+        else:
+            data[col] = pd.concat(parts, ignore_index=True)
+            if col in BOOL_COLUMNS:
+                data[col] = _downcast_bool(data[col])
+    return pd.DataFrame(data)
+
+def memory_usage(df):
+    return df.memory_usage(index=True, deep=True).sum()
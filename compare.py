@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import instrument
+from analyticsFuncs import LEVEL_SUMMARIES, MS_MIN_CONVERSION
+from models import Comparison, Config, LevelComparison, Period
+from rollup import basic_stats, cells_in_range
+
+GRAINS = {'Year': 'Y', 'Quarter': 'Q', 'Month': 'M'}
+MEASURES = ['total_ms', 'total_plays', 'plays_no_skips']
+
+def calendar_period(period):
+    return Period(
+        label=str(period),
+        start=period.start_time.tz_localize('UTC'),
+        end=(period + 1).start_time.tz_localize('UTC')
+    )
+
+# Plays from start up to (not including) end, like the Home page's range
+def date_period(start, end):
+    start = pd.Timestamp(start).tz_localize('UTC')
+    end = pd.Timestamp(end).tz_localize('UTC')
+    return Period(label=f"{start.date()} to {end.date()}", start=start, end=end)
+
+# 2023, 2023Q1, 2023-01 or 2023-01-01..2023-04-01
+def parse_period(text):
+    if '..' in text:
+        start, end = text.split('..', 1)
+        return date_period(start, end)
+    return calendar_period(pd.Period(text))
+
+# Every year/quarter/month touching [first, last)
+def available_periods(first, last, freq):
+    span = pd.period_range(first.tz_localize(None), (last - pd.Timedelta(days=1)).tz_localize(None), freq=freq)
+    return [calendar_period(period) for period in span]
+
+# Per entity code, the sum of each measure over a range's day cells. The cells are the
+# cube's per-day partial aggregates, so this costs O(cells in range + entities), not O(plays).
+def _entity_totals(cells, key, size):
+    codes = cells[key].to_numpy()
+    named = codes >= 0
+    return {
+        measure: np.bincount(codes[named], weights=cells[measure].to_numpy()[named], minlength=size)
+        for measure in MEASURES
+    }
+
+# 1 for the most played (ties to the most minutes), NaN where there were no plays
+def _ranks(plays, ms):
+    ranks = np.full(len(plays), np.nan)
+    played = np.flatnonzero(plays > 0)
+    order = played[np.lexsort((-ms[played], -plays[played]))]
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+# The level's name columns for the given group codes, from the first cell each appears in.
+# order is the cube's cells in the order of their first play.
+def _labels(cube, level, codes, order):
+    group_key, group_name, name_aggs = LEVEL_SUMMARIES[level]
+    cells = cube.cells
+    groups, first = np.unique(cells[group_key].to_numpy()[order], return_index=True)
+    rows = order[first[np.searchsorted(groups, codes)]]
+
+    labels = {group_name: pd.Categorical.from_codes(codes, categories=cube.names[group_key])}
+    for col, (entity, func) in name_aggs.items():
+        if func == 'first':
+            labels[col] = pd.Categorical.from_codes(cells[entity].to_numpy()[rows], categories=cube.names[entity])
+    return labels
+
+def _rank_name(table, level):
+    if level == 'track':
+        return table['track_name'].astype(str) + ' - ' + table['artist_name'].astype(str)
+    return table[LEVEL_SUMMARIES[level][1]].astype(str)
+
+# One row per entity played in any period: plays, minutes, skip % and rank per period, each
+# later period followed by its change from the one before (rank change > 0 is a climb).
+# ranks is the long (name, period, rank) data of everything in a period's top_n.
+def _compare_level(cube, slices, periods, level, top_n, first_order):
+    group_key = LEVEL_SUMMARIES[level][0]
+    size = len(cube.names[group_key])
+    totals = [_entity_totals(cells, group_key, size) for cells in slices]
+    plays, ms, no_skips = (np.vstack([total[measure] for total in totals]) for measure in ['total_plays', 'total_ms', 'plays_no_skips'])
+
+    active = np.flatnonzero(plays.sum(axis=0) > 0)
+    plays, ms, no_skips = plays[:, active], ms[:, active], no_skips[:, active]
+    minutes = ms / MS_MIN_CONVERSION
+    with np.errstate(invalid='ignore', divide='ignore'):
+        skips = np.where(plays > 0, (1 - no_skips / plays) * 100, np.nan)
+    ranks = np.vstack([_ranks(period_plays, period_ms) for period_plays, period_ms in zip(plays, ms)])
+
+    columns = _labels(cube, level, active, first_order)
+    for i, period in enumerate(periods):
+        columns[f'{period.label} plays'] = plays[i].astype(np.int64)
+        columns[f'{period.label} minutes'] = minutes[i]
+        columns[f'{period.label} skip %'] = skips[i]
+        columns[f'{period.label} rank'] = pd.array(ranks[i], dtype='Int64')
+        if i > 0:
+            columns[f'{period.label} change in plays'] = (plays[i] - plays[i - 1]).astype(np.int64)
+            columns[f'{period.label} change in minutes'] = minutes[i] - minutes[i - 1]
+            columns[f'{period.label} change in skip %'] = skips[i] - skips[i - 1]
+            columns[f'{period.label} rank change'] = pd.array(ranks[i - 1] - ranks[i], dtype='Int64')
+    table = pd.DataFrame(columns)
+
+    # Latest period's ranking first, then the earlier ones; unranked rows sort last
+    order = np.lexsort(ranks)
+    ranked = np.flatnonzero((ranks <= top_n).any(axis=0))
+    names = _rank_name(table, level)
+    rank_data = pd.DataFrame({
+        'name': np.tile(names.to_numpy()[ranked], len(periods)),
+        'period': np.repeat([period.label for period in periods], len(ranked)),
+        'rank': pd.array(ranks[:, ranked].ravel(), dtype='Int64')
+    })
+    return LevelComparison(table=table.iloc[order].reset_index(drop=True), ranks=rank_data)
+
+def _period_totals(cube, periods, slices):
+    rows = []
+    for period, cells in zip(periods, slices):
+        row = {'period': period.label, 'start': period.start.date(), 'end': period.end.date()}
+        if cells.empty:
+            row.update({'plays': 0, 'plays no skips': 0, 'minutes': 0.0, 'skip %': np.nan, 'unique tracks': 0, 'unique artists': 0, 'unique albums': 0})
+        else:
+            stats = basic_stats(cube, period.start, period.end)
+            row.update({
+                'plays': stats.total_plays,
+                'plays no skips': stats.total_plays_no_skips,
+                'minutes': stats.total_minutes,
+                'skip %': stats.skip_percentage * 100,
+                'unique tracks': stats.unique_tracks,
+                'unique artists': stats.unique_artists,
+                'unique albums': stats.unique_albums
+            })
+        rows.append(row)
+    totals = pd.DataFrame(rows)
+    for col in ['plays', 'minutes', 'skip %']:
+        totals[f'change in {col}'] = totals[col].diff()
+    totals['change in minutes %'] = (totals['minutes'].pct_change() * 100).replace([np.inf, -np.inf], np.nan)
+    return totals
+
+# Side by side summaries of N date ranges, all read from the rollup cube
+def compare_periods(cube, periods, top_n=None):
+    top_n = Config.top_n if top_n is None else top_n
+    periods = list(periods)
+    slices = [cells_in_range(cube, period.start, period.end) for period in periods]
+    first_order = np.argsort(cube.cells['first_row'].to_numpy(), kind='stable')
+    return Comparison(
+        periods=periods,
+        totals=_period_totals(cube, periods, slices),
+        songs=_compare_level(cube, slices, periods, 'track', top_n, first_order),
+        artists=_compare_level(cube, slices, periods, 'artist', top_n, first_order),
+        albums=_compare_level(cube, slices, periods, 'album', top_n, first_order)
+    )
+
+instrument.instrument_module(globals())
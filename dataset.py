@@ -0,0 +1,109 @@
+import functools
+import hashlib
+import io
+import threading
+
+import pandas as pd
+import instrument
+from archive import write_archive
+from cache import DataView, memoize
+from compact import memory_usage
+from compare import compare_periods
+from entitystats import EntityStats
+from models import ViewKey
+from ingest import append_plays
+from rollup import build_cube, extend_cube, range_summaries
+from search import SearchIndex
+from timeindex import TimeIndex
+from timeseries import cube_time_series
+
+def fingerprint(df):
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+    digest.update(','.join(df.columns).encode())
+    return digest.hexdigest()
+
+def _archive_bytes(df):
+    buffer = io.BytesIO()
+    write_archive(df, buffer)
+    return buffer.getvalue()
+
+# Everything derived from one loaded dataset, built once at upload
+class Dataset:
+    def __init__(self, df, uri_aliases=None, rollup=None, digest=None):
+        self.df = df
+        self.fingerprint = fingerprint(df) if digest is None else digest
+        self.uri_aliases = uri_aliases
+        self.time_index = TimeIndex(df)
+        self.search_index = SearchIndex(df)
+        self.rollup = build_cube(df) if rollup is None else rollup
+        self._entity_stats = None
+        self._entity_stats_lock = threading.Lock()
+
+    # A new Dataset with a newly loaded export merged in, and the AppendReport.
+    # The rollup cube is only re-aggregated from the first new play's day on.
+    def append(self, new_df):
+        df, uri_aliases, report = append_plays(self.df, self.uri_aliases, new_df)
+        if report.new_rows == 0:
+            return self, report
+        with instrument.span('rollup.extend_cube'):
+            rollup = extend_cube(self.rollup, df, report.first_new)
+        return Dataset(df, uri_aliases, rollup), report
+
+    @functools.cached_property
+    def memory_bytes(self):
+        return memory_usage(self.df)
+
+    # The saved-dataset zip for the download button, built on first click and shared by
+    # every Dataset with the same content
+    def export_archive(self):
+        with instrument.span('dataset.export_archive'):
+            return memoize(('export_archive', ViewKey(self.fingerprint)), _archive_bytes, self.df)
+
+    # Only the Track/Artist/Album pages need it, so it is built on first use. The Home
+    # page's background job and a page render can ask at once, and it is built only once.
+    @property
+    def entity_stats(self):
+        if self._entity_stats is None:
+            with self._entity_stats_lock:
+                if self._entity_stats is None:
+                    with instrument.span('dataset.entity_stats'):
+                        self._entity_stats = EntityStats(self.df, self.rollup)
+        return self._entity_stats
+
+    @property
+    def entity_stats_built(self):
+        return self._entity_stats is not None
+
+    # Every day from the first play to the last, the Home page's default range
+    def full_range(self):
+        return self.time_index.first.normalize(), self.time_index.last.normalize() + pd.Timedelta(days=1)
+
+    def view(self, start=None, end=None):
+        if start is None and end is None:
+            return DataView(self.df, ViewKey(self.fingerprint))
+        return DataView(self.time_index.slice(self.df, start, end), ViewKey(self.fingerprint, start=start, end=end))
+
+    def entity_view(self, df, entity):
+        return DataView(df, ViewKey(self.fingerprint, entity=entity))
+
+    # A table worked out from the plays between start and end, e.g. a ranking's full data
+    def range_view(self, df, name, start, end):
+        return DataView(df, (name, ViewKey(self.fingerprint, start=start, end=end)))
+
+    def range_summaries(self, start, end):
+        with instrument.span('dataset.range_summaries'):
+            return memoize(('range_summaries', ViewKey(self.fingerprint, start=start, end=end)), range_summaries, self.rollup, start, end)
+
+    # Summaries of each of the Periods side by side, see compare.compare_periods
+    def compare(self, periods):
+        with instrument.span('dataset.compare'):
+            return memoize(('compare', ViewKey(self.fingerprint), tuple(periods)), compare_periods, self.rollup, periods)
+
+    # One of a comparison's tables, keyed by the periods it compares
+    def comparison_view(self, df, name, periods):
+        return DataView(df, (name, ViewKey(self.fingerprint), tuple(periods)))
+
+    def time_series(self, start, end):
+        with instrument.span('dataset.time_series'):
+            return memoize(('time_series', ViewKey(self.fingerprint, start=start, end=end)), cube_time_series, self.rollup, start, end)
@@ -0,0 +1,43 @@
+import numpy as np
+
+# Largest-Triangle-Three-Buckets: positions of `threshold` points of the line (x, y) that keep
+# its visual shape - the first and last point, then per bucket the point making the largest
+# triangle with the previous pick and the next bucket's mean. x must be increasing.
+def lttb(x, y, threshold):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Mean of each bucket, then of the bucket after bucket i (the last point for the last one)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    picks = np.empty(threshold, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        areas = np.abs((x[prev] - next_x[i]) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (next_y[i] - y[prev]))
+        prev = lo + int(np.argmax(areas))
+        picks[i + 1] = prev
+    return picks
+
+# lttb, with the maximum swapped in for the nearest pick so a reported peak is always on
+# the chart and there are still exactly threshold points
+def downsample(x, y, threshold):
+    picks = lttb(x, y, threshold)
+    if len(picks) == len(y):
+        return picks
+    peak = int(np.argmax(y))
+    if peak not in picks:
+        # The first and last points are the maximum themselves if it is one of them
+        nearest = 1 + int(np.argmin(np.abs(picks[1:-1] - peak)))
+        picks[nearest] = peak
+        picks.sort()
+    return picks
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+from analyticsFuncs import DAYS_PER_MONTH, MS_MIN_CONVERSION, NS_PER_DAY, reorganiseColumns
+from compact import ENTITY_COLUMNS
+from models import ArtistAlbumStats, Config, SongStats
+
+# Tracks are keyed by their (canonical) URI, as a Track page result is always one URI
+STATS_KEYS = {'track': 'uri', 'artist': 'artist', 'album': 'album'}
+TABLE_NAME_COLUMNS = {'track': ['track', 'artist', 'album'], 'artist': ['artist'], 'album': ['album', 'artist']}
+
+def _months(days):
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+def _periods(values, unit, freq):
+    return pd.DatetimeIndex(values.astype(f'datetime64[{unit}]').astype('datetime64[ns]')).to_period(freq)
+
+# Busiest period per entity; ties go to the earliest period
+def _peak(base, period):
+    counts = base.groupby(['code', period], sort=False)['plays'].sum().reset_index()
+    peaks = counts.sort_values(['code', 'plays', period], ascending=[True, False, True], kind='stable').drop_duplicates('code')
+    return peaks.set_index('code')
+
+def _code_order(codes, n):
+    order = np.argsort(codes, kind='stable')
+    return order, np.searchsorted(codes[order], np.arange(n + 1))
+
+# Per-entity listening stats (first/last listen, peak month, busiest day, years active ...)
+# for every track, artist and album, reduced from the rollup cube's (day, entity) cells in
+# one grouped pass per level. The Track/Artist/Album reports then read a row of a table
+# instead of re-aggregating that entity's plays.
+class EntityStats:
+    def __init__(self, df, cube):
+        self.df = df
+        self.names = cube.names
+        self.skips_known = not df['skipped'].isna().any()
+        self.cells = cube.cells
+        days = cube.days[cube.cells['day'].to_numpy()]
+        self.base = pd.DataFrame({
+            'day': days,
+            'month': _months(days),
+            'year': days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64),
+            'plays': cube.cells['total_plays'].to_numpy()
+        })
+        self.tables = {entity: self._summarise(entity) for entity in STATS_KEYS}
+        # Cells of each artist/album, for the per-song breakdown in their reports
+        self.cell_order = {
+            entity: _code_order(cube.cells[STATS_KEYS[entity]].to_numpy(), len(self.names[STATS_KEYS[entity]]))
+            for entity in ['artist', 'album']
+        }
+
+    def _summarise(self, entity):
+        key = STATS_KEYS[entity]
+        valid = (self.cells[key] >= 0).to_numpy()
+        cells = self.cells[valid]
+        base = self.base[valid].assign(code=cells[key].to_numpy())
+
+        stats = cells.groupby(key, sort=True).agg(
+            total_plays=('total_plays', 'sum'),
+            plays_no_skips=('plays_no_skips', 'sum'),
+            total_ms=('total_ms', 'sum'),
+            first_row=('first_row', 'min'),
+            last_row=('last_row', 'max')
+        )
+        if entity != 'track':
+            # -1 codes are missing names, which nunique skips as NaN
+            for col, level in [('unique_songs', 'track'), ('unique_albums', 'album')]:
+                codes = cells[level].where(cells[level] >= 0)
+                stats[col] = codes.groupby(cells[key], sort=True).nunique()
+        stats['years_active'] = base.groupby('code', sort=True)['year'].nunique()
+
+        ts = self.df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        stats['timespan'] = (ts[stats['last_row']] - ts[stats['first_row']]) // NS_PER_DAY
+
+        month_peaks = _peak(base, 'month')
+        day_peaks = _peak(base, 'day')
+        stats['peak_month'] = month_peaks['month']
+        stats['peak_month_count'] = month_peaks['plays']
+        stats['most_plays_in_day_date'] = day_peaks['day']
+        stats['most_plays_in_day'] = day_peaks['plays']
+        return stats
+
+    def _entity_code(self, history, entity):
+        column = ENTITY_COLUMNS[STATS_KEYS[entity]]
+        if history.empty or history[column].dtype != self.df[column].dtype:
+            return None
+        codes = history[column].cat.codes.to_numpy()
+        if codes[0] < 0 or (codes != codes[0]).any():
+            return None
+        code = int(codes[0])
+        # Only a history holding all of the entity's plays can be answered from the table
+        if self.tables[entity].at[code, 'total_plays'] != len(history):
+            return None
+        return code
+
+    def _shared_fields(self, row, tot_plays):
+        timespan = int(row['timespan'])
+        return {
+            'tot_mins': row['total_ms'] / MS_MIN_CONVERSION,
+            'avg_plays_per_month': tot_plays / (max(timespan, 1) / DAYS_PER_MONTH),
+            'peak_month': pd.Period(np.datetime64(int(row['peak_month']), 'M'), freq='M'),
+            'peak_month_count': int(row['peak_month_count']),
+            'most_plays_in_day': int(row['most_plays_in_day']),
+            'most_plays_in_day_date': pd.Period(np.datetime64(int(row['most_plays_in_day_date']), 'D'), freq='D')
+        }
+
+    # The SongStats for a sorted Track page history, or None if it isn't one whole track
+    def song_stats(self, history):
+        code = self._entity_code(history, 'track')
+        if code is None or not self.skips_known:
+            return None
+        row = self.tables['track'].loc[code]
+        tot_plays = int(row['total_plays'])
+        full_plays = int(row['plays_no_skips'])
+
+        return SongStats(
+            name=history['master_metadata_track_name'].iloc[0],
+            artist=history['master_metadata_album_artist_name'].iloc[0],
+            album=history['master_metadata_album_album_name'].iloc[0],
+            first_listen=history['ts'].iloc[0],
+            last_listen=history['ts'].iloc[-1],
+            timespan=int(row['timespan']),
+            tot_plays=tot_plays,
+            tot_skips=tot_plays - full_plays,
+            full_plays=full_plays,
+            listen_rate=(full_plays / tot_plays) * 100,
+            **self._shared_fields(row, tot_plays)
+        )
+
+    def _song_breakdown(self, entity, code):
+        order, offsets = self.cell_order[entity]
+        cells = self.cells.iloc[order[offsets[code]:offsets[code + 1]]]
+        cells = cells[cells['track'] >= 0].sort_values('first_row', kind='stable')
+        cells = cells.assign(album=cells['album'].where(cells['album'] >= 0))
+        songs = cells.groupby('track', sort=True).agg(
+            Listens=('total_plays', 'sum'),
+            total_ms=('total_ms', 'sum'),
+            album=('album', 'first'),
+            plays_no_skips=('plays_no_skips', 'sum')
+        ).reset_index()
+
+        full_hist = pd.DataFrame({
+            'Song': pd.Categorical.from_codes(songs['track'], categories=self.names['track']),
+            'Listens': songs['Listens'],
+            'Album': pd.Categorical.from_codes(songs['album'].fillna(-1).astype(np.int64), categories=self.names['album']),
+            'Full Listens': songs['plays_no_skips'],
+            'Total Minutes': songs['total_ms'] / MS_MIN_CONVERSION
+        }).sort_values('Listens', ascending=False, kind='stable')
+
+        if entity == 'artist':
+            return reorganiseColumns(full_hist, ['Song', 'Album', 'Listens', 'Full Listens', 'Total Minutes'])
+        return reorganiseColumns(full_hist.drop(columns=['Album']), ['Song', 'Listens', 'Full Listens', 'Total Minutes'])
+
+    # The ArtistAlbumStats for a sorted Artist/Album page history, or None if it isn't one whole artist/album
+    def artist_album_stats(self, history, artist=False, album=False):
+        if artist == album:
+            return None
+        entity = 'artist' if artist else 'album'
+        code = self._entity_code(history, entity)
+        if code is None:
+            return None
+        row = self.tables[entity].loc[code]
+        full_hist = self._song_breakdown(entity, code)
+
+        return ArtistAlbumStats(
+            artist_name=history['master_metadata_album_artist_name'].iloc[0],
+            album_name=history['master_metadata_album_album_name'].iloc[0],
+            tot_plays=int(row['total_plays']),
+            unique_songs=int(row['unique_songs']),
+            unique_albums=int(row['unique_albums']),
+            first_song_row=history.iloc[0],
+            last_song_row=history.iloc[-1],
+            years_active=int(row['years_active']),
+            top_songs=full_hist.head(Config().top_n),
+            full_hist=full_hist,
+            **self._shared_fields(row, int(row['total_plays']))
+        )
+
+    # The whole stats table for one level with names decoded, e.g. for an "all artists" report
+    def table(self, entity):
+        stats = self.tables[entity]
+        first_rows = self.df.iloc[stats['first_row'].to_numpy()]
+        ts = self.df['ts']
+
+        table = pd.DataFrame(index=pd.RangeIndex(len(stats)))
+        for name in TABLE_NAME_COLUMNS[entity]:
+            table[f'{name}_name'] = first_rows[ENTITY_COLUMNS[name]].to_numpy()
+        if entity == 'track':
+            table['spotify_track_uri'] = pd.Categorical.from_codes(stats.index.to_numpy(), categories=self.names['uri'])
+        table['total_plays'] = stats['total_plays'].to_numpy()
+        table['plays_no_skips'] = stats['plays_no_skips'].to_numpy()
+        table['total_minutes'] = stats['total_ms'].to_numpy() / MS_MIN_CONVERSION
+        if entity != 'track':
+            table['unique_songs'] = stats['unique_songs'].to_numpy()
+            table['unique_albums'] = stats['unique_albums'].to_numpy()
+        table['first_listen'] = ts.iloc[stats['first_row'].to_numpy()].to_numpy()
+        table['last_listen'] = ts.iloc[stats['last_row'].to_numpy()].to_numpy()
+        table['timespan'] = stats['timespan'].to_numpy()
+        table['avg_plays_per_month'] = table['total_plays'] / (np.maximum(table['timespan'], 1) / DAYS_PER_MONTH)
+        table['years_active'] = stats['years_active'].to_numpy()
+        # Periods as text ('2023-05', '2023-05-17'), which every report format can hold
+        table['peak_month'] = _periods(stats['peak_month'].to_numpy(), 'M', 'M').astype(str)
+        table['peak_month_count'] = stats['peak_month_count'].to_numpy()
+        table['most_plays_in_day_date'] = _periods(stats['most_plays_in_day_date'].to_numpy(), 'D', 'D').astype(str)
+        table['most_plays_in_day'] = stats['most_plays_in_day'].to_numpy()
+        return table.sort_values('total_plays', ascending=False, kind='stable').reset_index(drop=True)
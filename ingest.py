@@ -0,0 +1,281 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from compact import ENTITY_COLUMNS, STRING_DTYPE, compact_dataset, concat_compact
+import instrument
+from models import AppendReport, FileParseReport, IngestReport
+from timeindex import ensure_sorted
+
+# Columns kept from each Streaming_History_Audio_*.json record and the dtype they are parsed into.
+# Anything not listed here (ip_addr, episode_*, audiobook_* ...) is never materialised.
+INGEST_COLUMNS = {
+    'ts': 'datetime64[ns, UTC]',
+    'platform': 'object',
+    'ms_played': 'int64',
+    'conn_country': 'object',
+    'master_metadata_track_name': 'object',
+    'master_metadata_album_artist_name': 'object',
+    'master_metadata_album_album_name': 'object',
+    'spotify_track_uri': 'object',
+    'reason_start': 'object',
+    'reason_end': 'object',
+    'shuffle': 'boolean',
+    'skipped': 'boolean',
+    'offline': 'boolean',
+    'offline_timestamp': 'Int64',
+    'incognito_mode': 'boolean'
+}
+NULLABLE_DTYPES = {'boolean': bool, 'Int64': np.int64}
+MAX_WORKERS = os.cpu_count() or 1
+
+def _read_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return os.path.basename(source), f.read()
+    return source.name, source.getvalue()
+
+def _parse_column(values, dtype):
+    if dtype == 'datetime64[ns, UTC]':
+        return pd.to_datetime(values, utc=True, format='ISO8601').as_unit('ns').asi8
+    if dtype in NULLABLE_DTYPES:
+        arr = pd.array(values, dtype=dtype)
+        return arr.to_numpy(dtype=NULLABLE_DTYPES[dtype], na_value=0), arr.isna()
+    if dtype == 'int64':
+        return np.asarray(values, dtype=np.int64)
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+def _parse_file(name, raw):
+    start = time.perf_counter()
+    records = json.loads(raw)
+    del raw
+    columns = {col: _parse_column([record.get(col) for record in records], dtype) for col, dtype in INGEST_COLUMNS.items()}
+    rows = len(records)
+    return name, rows, time.perf_counter() - start, columns
+
+def _merge_parsed(parsed):
+    total = sum(rows for _, rows, _, _ in parsed)
+    offsets = np.cumsum([0] + [rows for _, rows, _, _ in parsed])
+    data = {}
+
+    # Column at a time, popping each file's slice once it is copied, so at most one
+    # column is duplicated at any point rather than the whole frame.
+    for col, dtype in INGEST_COLUMNS.items():
+        if dtype in NULLABLE_DTYPES:
+            values = np.empty(total, dtype=NULLABLE_DTYPES[dtype])
+            mask = np.empty(total, dtype=bool)
+            for (_, _, _, columns), start, end in zip(parsed, offsets[:-1], offsets[1:]):
+                values[start:end], mask[start:end] = columns.pop(col)
+            if dtype == 'boolean':
+                data[col] = pd.arrays.BooleanArray(values, mask)
+            else:
+                data[col] = pd.arrays.IntegerArray(values, mask)
+        else:
+            out = np.empty(total, dtype=np.int64 if dtype != 'object' else object)
+            for (_, _, _, columns), start, end in zip(parsed, offsets[:-1], offsets[1:]):
+                out[start:end] = columns.pop(col)
+            if dtype == 'datetime64[ns, UTC]':
+                out = pd.DatetimeIndex(out.view('datetime64[ns]')).tz_localize('UTC')
+            elif dtype == 'object':
+                out = pd.array(out, dtype=STRING_DTYPE)
+            data[col] = out
+
+    return pd.DataFrame(data, copy=False)
+
+def load_json_files(sources, max_workers=None):
+    start = time.perf_counter()
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    workers = max(1, min(len(sources), max_workers))
+
+    payloads = [_read_bytes(source) for source in sources]
+    names = [name for name, _ in payloads]
+    raws = [raw for _, raw in payloads]
+    del payloads
+
+    if workers == 1:
+        parsed = [_parse_file(name, raw) for name, raw in zip(names, raws)]
+    else:
+        # spawn rather than fork - forking the threaded Streamlit server is not safe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            parsed = list(pool.map(_parse_file, names, raws))
+    del raws
+
+    file_reports = [
+        FileParseReport(
+            name=name,
+            rows=rows,
+            seconds=seconds,
+            rows_per_sec=rows / seconds if seconds > 0 else 0
+        )
+        for name, rows, seconds, _ in parsed
+    ]
+    df = _merge_parsed(parsed)
+    seconds = time.perf_counter() - start
+
+    return df, IngestReport(
+        files=file_reports,
+        total_rows=len(df),
+        seconds=seconds,
+        rows_per_sec=len(df) / seconds if seconds > 0 else 0,
+        workers=workers
+    )
+
+def report_table(report):
+    return pd.DataFrame([
+        {
+            'File': file.name,
+            'Rows': file.rows,
+            'Parse Seconds': file.seconds,
+            'Rows/sec': file.rows_per_sec
+        }
+        for file in report.files
+    ])
+
+def canonicalise_track_uris(df):
+    track_col, artist_col, uri_col = 'master_metadata_track_name', 'master_metadata_album_artist_name', 'spotify_track_uri'
+
+    # Plays with no track/artist metadata (podcasts, audiobooks) have no canonical track
+    has_pair = (df[track_col].notna() & df[artist_col].notna()).to_numpy()
+    if not has_pair.all():
+        df = df.loc[has_pair].reset_index(drop=True)
+    if df.empty:
+        return df, pd.DataFrame(columns=['spotify_track_uri', 'alias_uri', 'album_name', 'plays'])
+
+    track_codes, _ = pd.factorize(df[track_col])
+    artist_codes, _ = pd.factorize(df[artist_col])
+    pair_ids, _ = pd.factorize(track_codes.astype(np.int64) * (artist_codes.max() + 1) + artist_codes)
+    uri_codes, uri_names = pd.factorize(df[uri_col], sort=True)
+    uri_names = pd.Index(np.asarray(uri_names, dtype=object))
+
+    # Canonical URI of a (track, artist) pair is the first non-null URI it was played under
+    valid_rows = np.flatnonzero(uri_codes >= 0)
+    pairs_with_uri, first_valid = np.unique(pair_ids[valid_rows], return_index=True)
+    canonical = np.full(pair_ids.max() + 1, -1, dtype=np.int64)
+    canonical[pairs_with_uri] = uri_codes[valid_rows[first_valid]]
+    canonical_codes = canonical.take(pair_ids)
+
+    versions = (
+        pd.DataFrame({
+            'pair': pair_ids,
+            'uri': uri_codes,
+            'row': np.arange(len(pair_ids))
+        })
+        .loc[lambda d: d['uri'] >= 0]
+        .groupby(['pair', 'uri'], sort=False)
+        .agg(first_row=('row', 'first'), plays=('row', 'size'))
+        .reset_index()
+    )
+    versions = versions[versions.groupby('pair')['uri'].transform('size') > 1]
+    uri_aliases = pd.DataFrame({
+        'spotify_track_uri': uri_names.take(canonical[versions['pair'].to_numpy()]),
+        'alias_uri': uri_names.take(versions['uri'].to_numpy()),
+        'album_name': df['master_metadata_album_album_name'].to_numpy().take(versions['first_row'].to_numpy()),
+        'plays': versions['plays'].to_numpy()
+    }).sort_values(['spotify_track_uri', 'plays'], ascending=[True, False], ignore_index=True)
+
+    df[uri_col] = pd.Categorical.from_codes(canonical_codes, categories=uri_names).remove_unused_categories()
+    return df, uri_aliases
+
+# Everything a freshly loaded frame (JSON or parquet) goes through before analysis
+def prepare_dataset(df):
+    df = compact_dataset(df)
+    df, uri_aliases = canonicalise_track_uris(df)
+    return ensure_sorted(df), uri_aliases
+
+# Rows are the same play if they share these; hashed so the check is one vectorized lookup
+DEDUPE_COLUMNS = ['ts', 'spotify_track_uri', 'ms_played']
+
+def play_keys(df):
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        'ts': df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        'uri': df['spotify_track_uri'],
+        'ms_played': df['ms_played'].to_numpy(dtype=np.int64)
+    }), index=False).to_numpy()
+
+# Canonical URIs for incoming plays: a (track, artist) pair the dataset already has keeps its
+# URI, so earlier plays never change; new pairs go through canonicalise_track_uris as usual.
+def _canonicalise_incoming(existing, new):
+    pair_cols = [ENTITY_COLUMNS['track'], ENTITY_COLUMNS['artist']]
+    cols = pair_cols + [ENTITY_COLUMNS['album'], 'spotify_track_uri']
+    known = existing.drop_duplicates(pair_cols)[cols]
+    combined, _ = canonicalise_track_uris(concat_compact([known, new[cols]]))
+    return combined['spotify_track_uri'].iloc[len(known):].reset_index(drop=True)
+
+# Merged-versions table after an append: the previous table, existing plays of pairs it
+# didn't cover (all under their canonical URI) and the new plays under the URI they were played as
+def _merge_aliases(existing, uri_aliases, new, canonical):
+    existing_plays = (
+        existing.groupby('spotify_track_uri', observed=True)
+        .agg(plays=('ms_played', 'size'), album_name=(ENTITY_COLUMNS['album'], 'first'))
+        .reset_index()
+    )
+    if uri_aliases is not None and not uri_aliases.empty:
+        existing_plays = existing_plays[~existing_plays['spotify_track_uri'].isin(uri_aliases['spotify_track_uri'])]
+    existing_plays = existing_plays.assign(alias_uri=existing_plays['spotify_track_uri'])
+
+    new_plays = (
+        pd.DataFrame({
+            'spotify_track_uri': canonical.to_numpy(dtype=object),
+            'alias_uri': new['spotify_track_uri'].to_numpy(dtype=object),
+            'album_name': new[ENTITY_COLUMNS['album']].to_numpy(dtype=object)
+        })
+        .dropna(subset=['spotify_track_uri', 'alias_uri'])
+        .groupby(['spotify_track_uri', 'alias_uri'], sort=False)
+        .agg(plays=('album_name', 'size'), album_name=('album_name', 'first'))
+        .reset_index()
+    )
+
+    parts = [existing_plays[['spotify_track_uri', 'alias_uri', 'album_name', 'plays']].astype(object), new_plays]
+    if uri_aliases is not None:
+        parts.insert(0, uri_aliases)
+    versions = pd.concat(parts, ignore_index=True)
+    versions = (
+        versions.groupby(['spotify_track_uri', 'alias_uri'], sort=False)
+        .agg(album_name=('album_name', 'first'), plays=('plays', 'sum'))
+        .reset_index()
+    )
+    versions = versions[versions.groupby('spotify_track_uri')['alias_uri'].transform('size') > 1]
+    return versions.sort_values(['spotify_track_uri', 'plays'], ascending=[True, False], ignore_index=True)
+
+# Merges a newly loaded (raw) export into a prepared dataset. Plays already in the dataset,
+# or repeated across the new files, are dropped; the result is prepared and sorted.
+def append_plays(existing, uri_aliases, new_df):
+    start = time.perf_counter()
+    incoming = len(new_df)
+    new = compact_dataset(new_df)
+
+    has_pair = (new[ENTITY_COLUMNS['track']].notna() & new[ENTITY_COLUMNS['artist']].notna()).to_numpy()
+    new = new.loc[has_pair].reset_index(drop=True)
+    canonical = _canonicalise_incoming(existing, new) if len(new) else new['spotify_track_uri']
+    canonical_new = new.assign(spotify_track_uri=canonical.array)
+
+    keys = pd.Series(play_keys(canonical_new))
+    duplicate = (keys.isin(play_keys(existing)) | keys.duplicated()).to_numpy()
+    new, canonical, canonical_new = new[~duplicate], canonical[~duplicate], canonical_new[~duplicate]
+
+    if len(canonical_new):
+        merged = ensure_sorted(concat_compact([existing, canonical_new]))
+        merged_aliases = _merge_aliases(existing, uri_aliases, new, canonical)
+        first_new, last_new = canonical_new['ts'].min(), canonical_new['ts'].max()
+    else:
+        merged, merged_aliases, first_new, last_new = existing, uri_aliases, None, None
+
+    return merged, merged_aliases, AppendReport(
+        existing_rows=len(existing),
+        incoming_rows=incoming,
+        new_rows=len(canonical_new),
+        duplicate_rows=int(duplicate.sum()),
+        dropped_rows=int((~has_pair).sum()),
+        first_new=first_new,
+        last_new=last_new,
+        seconds=time.perf_counter() - start
+    )
+
+instrument.instrument_module(globals())
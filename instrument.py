@@ -0,0 +1,227 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+
+from models import RunProfile, SpanRecord
+
+PROFILE_ENV = 'DASHBOARD_PROFILE'
+PROFILE_LOG_ENV = 'DASHBOARD_PROFILE_LOG'
+
+class _State:
+    def __init__(self):
+        self.log_path = os.environ.get(PROFILE_LOG_ENV)
+        # Set from the environment, every run is profiled whatever its session asks for
+        self.forced = bool(os.environ.get(PROFILE_ENV)) or bool(self.log_path)
+        # tracemalloc is process-wide, so it runs while any thread's run tracks allocations
+        self.tracing_runs = 0
+        self.started_tracing = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+STATE = _State()
+
+def configure(log_path=None):
+    if log_path is not None:
+        STATE.log_path = log_path
+        STATE.forced = STATE.forced or bool(log_path)
+
+# Whether this thread's run is being profiled
+def enabled():
+    return _current_run() is not None
+
+def _acquire_tracing():
+    with STATE.lock:
+        STATE.tracing_runs += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            STATE.started_tracing = True
+
+def _release_tracing():
+    with STATE.lock:
+        STATE.tracing_runs -= 1
+        if STATE.tracing_runs == 0 and STATE.started_tracing:
+            tracemalloc.stop()
+            STATE.started_tracing = False
+
+class _Run:
+    def __init__(self, name, allocations):
+        self.name = name
+        self.allocations = allocations
+        self.started = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.release = None
+        if allocations:
+            _acquire_tracing()
+            # A run that never reaches end_run (e.g. interrupted by st.rerun()) lets go of
+            # tracemalloc when it is replaced or collected
+            self.release = weakref.finalize(self, _release_tracing)
+
+    def close(self):
+        if self.release is not None:
+            self.release()
+
+def _current_run():
+    return getattr(STATE.local, 'run', None)
+
+# The flags are the session's own, so one session's settings never change another's runs
+def begin_run(name='rerun', enabled=False, allocations=False):
+    previous = _current_run()
+    if previous is not None:
+        previous.close()
+    if not (enabled or STATE.forced):
+        STATE.local.run = None
+        return
+    STATE.local.run = _Run(name, allocations)
+
+def end_run():
+    run = _current_run()
+    STATE.local.run = None
+    if run is None:
+        return None
+    run.close()
+
+    profile = RunProfile(
+        name=run.name,
+        seconds=time.perf_counter() - run.started,
+        spans=run.spans,
+        cache_hits=run.cache_hits,
+        cache_misses=run.cache_misses
+    )
+    if STATE.log_path:
+        write_log(profile, STATE.log_path)
+    return profile
+
+class _Frame:
+    def __init__(self, name, depth, allocations):
+        self.name = name
+        self.depth = depth
+        self.cache = None
+        self.child_peak = 0
+        self.start_memory = 0
+        if allocations:
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+
+# Times the block and, when allocation tracking is on, its peak traced memory above the
+# starting point. Children reset the tracemalloc peak, so each frame also keeps the largest
+# absolute peak its children saw. The peak is process-wide, so runs tracking allocations at
+# the same time see each other's.
+@contextmanager
+def span(name):
+    run = _current_run()
+    if run is None:
+        yield
+        return
+
+    frame = _Frame(name, len(run.stack), run.allocations)
+    index = len(run.spans)
+    run.spans.append(None)
+    run.stack.append(frame)
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - frame.started
+        peak_kb = None
+        if run.allocations:
+            absolute_peak = max(tracemalloc.get_traced_memory()[1], frame.child_peak)
+            peak_kb = max(absolute_peak - frame.start_memory, 0) / 1024
+        run.stack.pop()
+        if run.stack and run.allocations:
+            run.stack[-1].child_peak = max(run.stack[-1].child_peak, absolute_peak)
+        run.spans[index] = SpanRecord(name=name, seconds=seconds, depth=frame.depth, peak_kb=peak_kb, cache=frame.cache)
+
+class _Section:
+    def __init__(self):
+        self.profile = None
+
+# A page section that can rerun without the rest of the script (a Streamlit fragment). Inside
+# a full run it is a span; rerun on its own it is profiled as a run of its own, whose
+# profile is left on the yielded object
+@contextmanager
+def section(name, enabled=False, allocations=False):
+    result = _Section()
+    if _current_run() is not None:
+        with span(name):
+            yield result
+        return
+    begin_run(name, enabled, allocations)
+    try:
+        yield result
+    finally:
+        result.profile = end_run()
+
+# Called by the analytics cache so each span shows whether it was served from cache
+def record_cache(hit):
+    run = _current_run()
+    if run is None:
+        return
+    if hit:
+        run.cache_hits += 1
+    else:
+        run.cache_misses += 1
+    if run.stack and run.stack[-1].cache is None:
+        run.stack[-1].cache = 'hit' if hit else 'miss'
+
+def instrumented(func, name=None):
+    if getattr(func, '__instrumented__', False):
+        return func
+    name = name or f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_run() is None:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+    wrapper.__instrumented__ = True
+    return wrapper
+
+# Wraps every function defined in a module. Called at the bottom of the module with its
+# globals(), so calls between the module's own functions are timed too.
+def instrument_module(namespace):
+    module = namespace['__name__']
+    for attr, value in list(namespace.items()):
+        if inspect.isfunction(value) and value.__module__ == module:
+            namespace[attr] = instrumented(value)
+
+def span_table(profile):
+    return [
+        {
+            'Span': '  ' * record.depth + record.name,
+            'ms': round(record.seconds * 1000, 2),
+            'Peak KB': None if record.peak_kb is None else round(record.peak_kb, 1),
+            'Cache': record.cache
+        }
+        for record in profile.spans
+    ]
+
+def totals_by_name(profile):
+    totals = {}
+    for record in profile.spans:
+        total = totals.setdefault(record.name, {'Function': record.name, 'Calls': 0, 'ms': 0.0})
+        total['Calls'] += 1
+        total['ms'] += record.seconds * 1000
+    return sorted(totals.values(), key=lambda total: total['ms'], reverse=True)
+
+def write_log(profile, path):
+    timestamp = time.time()
+    with open(path, 'a') as f:
+        for record in profile.spans:
+            f.write(json.dumps({
+                'type': 'span', 'run': profile.name, 'time': timestamp, 'name': record.name,
+                'seconds': record.seconds, 'depth': record.depth, 'peak_kb': record.peak_kb, 'cache': record.cache
+            }) + '\n')
+        f.write(json.dumps({
+            'type': 'run', 'run': profile.name, 'time': timestamp, 'seconds': profile.seconds,
+            'spans': len(profile.spans), 'cache_hits': profile.cache_hits, 'cache_misses': profile.cache_misses
+        }) + '\n')
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 from typing import Tuple
 
@@ -117,4 +118,145 @@ class PolarPlotData:
     hourly_counts: pd.DataFrame
     daily_counts_week: pd.DataFrame
     daily_counts_month: pd.DataFrame
-    monthly_counts: pd.DataFrame
\ No newline at end of file
+    monthly_counts: pd.DataFrame
+
+@dataclass
+class TemporalHistograms:
+    hours: np.ndarray
+    weekdays: np.ndarray
+    days_of_month: np.ndarray
+    months: np.ndarray
+    hour_weekday: np.ndarray
+
+@dataclass
+class GrainSeries:
+    series: pd.DataFrame
+    peak_minutes_date: pd.Timestamp
+    peak_minutes: float
+    peak_streams_period: pd.Period
+    peak_streams: int
+    correlation: float
+
+@dataclass
+class TimeSeries:
+    daily: GrainSeries
+    weekly: GrainSeries
+    monthly: GrainSeries
+    yearly: GrainSeries
+
+@dataclass
+class FileParseReport:
+    name: str
+    rows: int
+    seconds: float
+    rows_per_sec: float
+
+@dataclass
+class IngestReport:
+    files: list
+    total_rows: int
+    seconds: float
+    rows_per_sec: float
+    workers: int
+
+@dataclass
+class RollupCube:
+    days: np.ndarray
+    day_offsets: np.ndarray
+    cells: pd.DataFrame
+    hour_counts: np.ndarray
+    names: dict
+
+@dataclass(frozen=True)
+class ViewKey:
+    fingerprint: str
+    start: pd.Timestamp = None
+    end: pd.Timestamp = None
+    entity: Tuple = None
+
+@dataclass
+class CacheInfo:
+    hits: int
+    misses: int
+    entries: int
+    bytes: int = 0
+
+@dataclass
+class RegistryUsage:
+    datasets: int
+    sessions: int
+    dataset_bytes: int
+    cache_bytes: int
+    budget_bytes: int
+    evictions: int
+
+@dataclass
+class LevelSummaries:
+    songs: pd.DataFrame
+    artists: pd.DataFrame
+    albums: pd.DataFrame
+
+@dataclass
+class SpanRecord:
+    name: str
+    seconds: float
+    depth: int
+    peak_kb: float = None
+    cache: str = None
+
+@dataclass
+class RunProfile:
+    name: str
+    seconds: float
+    spans: list
+    cache_hits: int
+    cache_misses: int
+
+@dataclass
+class NoMatch:
+    message: str
+
+@dataclass
+class AmbiguousMatch:
+    message: str
+    matches: pd.DataFrame
+
+@dataclass
+class AppendReport:
+    existing_rows: int
+    incoming_rows: int
+    new_rows: int
+    duplicate_rows: int
+    dropped_rows: int
+    first_new: pd.Timestamp
+    last_new: pd.Timestamp
+    seconds: float
+
+@dataclass
+class TablePage:
+    rows: pd.DataFrame
+    total_rows: int
+    matched_rows: int
+    page: int
+    pages: int
+    first_row: int
+    last_row: int
+
+@dataclass(frozen=True)
+class Period:
+    label: str
+    start: pd.Timestamp
+    end: pd.Timestamp
+
+@dataclass
+class LevelComparison:
+    table: pd.DataFrame
+    ranks: pd.DataFrame
+
+@dataclass
+class Comparison:
+    periods: list
+    totals: pd.DataFrame
+    songs: LevelComparison
+    artists: LevelComparison
+    albums: LevelComparison
@@ -1,7 +1,11 @@
 import streamlit as st
 import plotly.express as px
-from analyticsFuncs import MS_MIN_CONVERSION
+from timeseries import GRAINS, grain
+from downsample import downsample
+from models import DAYS_OF_WEEK
+import numpy as np
 import pandas as pd
+import instrument
 
 POLAR_PLOTS_DEFULTS = {
     'hourly_counts': {'dftitle': 'hourly_counts', 'theta': 'hour', 'r': 'count', 'title': "Listens by Hour of Day", 'labels': {'hour': 'Hour of Day', 'count': 'Number of Listens'}},
@@ -13,60 +17,61 @@ TEMPLATE = "plotly_dark"
 POLAR_BARGAP = 0
 MARKER_LINE_WIDTH = 1
 MARKER_LINE_COLOR = "black"
-FREQ_MAP = {
-    "Daily": "D",
-    "Weekly": "W",
-    "Monthly": "M",
-    "Yearly": "Y"
-    }
 MINUTE_PLOT_LABELS = {'ts': 'Date', 'minutes': 'Minutes Played'}
 STREAMS_PLOT_LABELS = {'ts': 'Date', 'streams': 'Number of Streams'}
-
-def line_plot(df, x, y, title, labels):
+# Points sent to the browser per line chart; a daily grain over ten years is ~3,650
+MAX_LINE_POINTS = 1000
+WEBGL_THRESHOLD = 2000
+
+def _positions(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return values.to_numpy(dtype=np.float64)
+
+# Long series are cut down to max_points (None for every point) with LTTB, which keeps the
+# line's shape and its peak; anything still above WEBGL_THRESHOLD points is drawn with WebGL
+def line_plot(df, x, y, title, labels, max_points=MAX_LINE_POINTS):
+    if max_points is not None and len(df) > max_points:
+        df = df.iloc[downsample(_positions(df[x]), df[y].to_numpy(), max_points)]
     fig = px.line(
         df,
         x=x,
         y=y,
         title=title,
         labels=labels,
-        template=TEMPLATE
+        template=TEMPLATE,
+        render_mode='webgl' if len(df) > WEBGL_THRESHOLD else 'svg'
     )
     fig.update_layout(hovermode="x unified")
     return fig
 
-def make_mins_and_streams_plots(df):
-        
+# Draws a precomputed TimeSeries, so moving the slider only picks another grain
+def make_mins_and_streams_plots(series, max_points=MAX_LINE_POINTS):
+    if series is None:
+        st.write("No listens in this period")
+        return
+
     selected_label = st.select_slider(
         "Select Time Grain",
-        options=["Daily", "Weekly", "Monthly", "Yearly"],
+        options=list(GRAINS),
         value="Weekly"
     )
-    freq_alias = FREQ_MAP[selected_label]
-    resampled_df = df.set_index('ts').resample(freq_alias)['ms_played'].agg(['sum', 'size']).reset_index()
-    resampled_df.columns = ['ts', 'ms_played', 'streams']
-    resampled_df['minutes'] = resampled_df['ms_played'] / MS_MIN_CONVERSION
+    data = grain(series, selected_label)
+    resampled_df = data.series
 
     start_data = resampled_df['ts'].iloc[0].date()
     end_data = resampled_df['ts'].iloc[-1].date()
     title = f"Total Minutes Listened ({selected_label}) between {start_data} and {end_data}"
-    st.plotly_chart(line_plot(resampled_df, 'ts', 'minutes', title, MINUTE_PLOT_LABELS), width='stretch')
+    st.plotly_chart(line_plot(resampled_df, 'ts', 'minutes', title, MINUTE_PLOT_LABELS, max_points), width='stretch')
 
-    peak_mins_t = resampled_df['minutes'].idxmax()
-    peak_mins_freq = resampled_df['minutes'].max()
-    peak_mins_t = resampled_df['ts'].iloc[peak_mins_t].date()
-    st.write(f"Peak {selected_label}: {peak_mins_t} with {peak_mins_freq:.2f} mins")
+    st.write(f"Peak {selected_label}: {data.peak_minutes_date.date()} with {data.peak_minutes:.2f} mins")
 
     title = f"Total Streams ({selected_label}) between {start_data} and {end_data}"
-    st.plotly_chart(line_plot(resampled_df, 'ts', 'streams', title, STREAMS_PLOT_LABELS), width='stretch')
-
-    track_ts = df['ts'].dt.to_period(freq_alias)
-    peak_t = track_ts.value_counts().idxmax()
-    peak_t_count = track_ts.value_counts().max()
+    st.plotly_chart(line_plot(resampled_df, 'ts', 'streams', title, STREAMS_PLOT_LABELS, max_points), width='stretch')
 
-    st.write(f"Peak {selected_label}: {peak_t} with {peak_t_count} listnes")
+    st.write(f"Peak {selected_label}: {data.peak_streams_period} with {data.peak_streams} listnes")
     
-    corr = resampled_df['minutes'].corr(resampled_df['streams'])
-    st.write(f"Correlation between Minutes Played and Number of Streams: {corr:.4f}")
+    st.write(f"Correlation between Minutes Played and Number of Streams: {data.correlation:.4f}")
 
 def make_polar_plot(df, theta, r, title, labels):
     fig = px.bar_polar(
@@ -102,6 +107,33 @@ def make_polar_plots(data, config=POLAR_PLOTS_DEFULTS):
         plots[time_period] = fig
     return plots
 
+def make_hour_weekday_heatmap(histograms):
+    fig = px.imshow(
+        histograms.hour_weekday,
+        x=[f"{hour}:00" for hour in range(24)],
+        y=list(DAYS_OF_WEEK.values()),
+        labels={'x': 'Hour of Day', 'y': 'Day of Week', 'color': 'Number of Listens'},
+        title="Listens by Hour and Day of Week",
+        aspect='auto',
+        template=TEMPLATE
+    )
+    return fig
+
+# Rank of each name per period, 1 at the top; gaps are periods it wasn't played in
+def make_rank_chart(ranks, title):
+    fig = px.line(
+        ranks,
+        x='period',
+        y='rank',
+        color='name',
+        markers=True,
+        title=title,
+        labels={'period': 'Period', 'rank': 'Rank', 'name': ''},
+        template=TEMPLATE
+    )
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
 def plot_polar_plots(plots):
     cols = st.columns(len(plots))
     figs = list(plots.values())
@@ -162,3 +194,5 @@ def make_pie_chart_album(df, max_elements = 10):
     )
     fig.update_traces(textposition='inside', textinfo='percent+label', sort=False, rotation=0, direction='clockwise')
     return fig
+
+instrument.instrument_module(globals())
@@ -0,0 +1,65 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import analyticsFuncs
+
+# Leave a core for the Streamlit server; the tasks are mostly numpy/pandas work that
+# releases the GIL
+MAX_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+_POOL = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='precompute')
+
+def _home_summaries(dataset, start, end):
+    summaries = dataset.range_summaries(start, end)
+    analyticsFuncs.rank_songs(summaries.songs)
+    analyticsFuncs.rank_artists(summaries.artists)
+    analyticsFuncs.rank_albums(summaries.albums)
+
+def home_tasks(dataset):
+    start, end = dataset.full_range()
+    return [
+        ('Top tracks, artists and albums', lambda: _home_summaries(dataset, start, end)),
+        ('Listening over time', lambda: dataset.time_series(start, end)),
+        ('Track, artist and album reports', lambda: dataset.entity_stats)
+    ]
+
+# Warming for one dataset: each task fills the analytics cache (or the Dataset's lazy
+# attributes) so the first visit to a page reads results instead of computing them
+class Job:
+    def __init__(self, fingerprint, tasks):
+        self.fingerprint = fingerprint
+        self.cancelled = threading.Event()
+        self.names = [name for name, _ in tasks]
+        self.futures = [_POOL.submit(self._run, task) for _, task in tasks]
+
+    def _run(self, task):
+        if not self.cancelled.is_set():
+            task()
+
+    # Tasks that haven't started are dropped; a running one finishes, as pandas can't be interrupted
+    def cancel(self):
+        self.cancelled.set()
+        for future in self.futures:
+            future.cancel()
+
+    def completed(self):
+        return sum(future.done() for future in self.futures)
+
+    def done(self):
+        return self.completed() == len(self.futures)
+
+    def pending(self):
+        return [name for name, future in zip(self.names, self.futures) if not future.done()]
+
+    def errors(self):
+        return [
+            (name, future.exception()) for name, future in zip(self.names, self.futures)
+            if future.done() and not future.cancelled() and future.exception() is not None
+        ]
+
+def start(dataset, previous=None):
+    if previous is not None:
+        if previous.fingerprint == dataset.fingerprint:
+            return previous
+        previous.cancel()
+    return Job(dataset.fingerprint, home_tasks(dataset))
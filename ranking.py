@@ -0,0 +1,65 @@
+import weakref
+
+import numpy as np
+
+# Rank orders are kept per summary table (summaries are cached, so they live as long as
+# the cache entry). Each sort key only ever materialises the prefix of its order that
+# has been asked for, found with a partial selection instead of a full sort.
+_RANK_ORDERS = {}
+
+class RankOrder:
+    def __init__(self, summary):
+        self.summary_ref = weakref.ref(summary)
+        self.columns = {}
+        self.prefixes = {}
+
+    def _column(self, name):
+        if name not in self.columns:
+            self.columns[name] = self.summary_ref()[name].to_numpy(dtype=float)
+        return self.columns[name]
+
+    def _sort_key(self, name, ascending):
+        values = self._column(name)
+        return values if ascending else -values
+
+    def _prefix(self, by, ascending, k):
+        key = (by, ascending)
+        prefix, complete = self.prefixes.get(key, (None, False))
+        if prefix is not None and (complete or len(prefix) >= k):
+            return prefix, complete
+
+        primary = self._sort_key(by[0], ascending[0])
+        if k >= len(primary):
+            candidates = np.arange(len(primary))
+        else:
+            # Everything tied with the k-th value is kept, so the prefix is exact
+            kth = np.partition(primary, k - 1)[k - 1]
+            candidates = np.flatnonzero(primary <= kth)
+
+        # Ties fall back to the secondary keys, then to the summary's own row order
+        keys = [candidates]
+        keys += [self._sort_key(name, asc)[candidates] for name, asc in reversed(list(zip(by[1:], ascending[1:])))]
+        keys.append(primary[candidates])
+        prefix = candidates[np.lexsort(keys)]
+        complete = len(candidates) == len(primary)
+
+        self.prefixes[key] = (prefix, complete)
+        return prefix, complete
+
+    def top(self, by, ascending, n, min_plays=None):
+        eligible = None if min_plays is None else self._column('total_plays') >= min_plays
+        k = max(n, 1)
+        while True:
+            prefix, complete = self._prefix(by, ascending, k)
+            picked = prefix if eligible is None else prefix[eligible[prefix]]
+            if len(picked) >= n or complete:
+                return picked[:n]
+            k *= 4
+
+def rank_order(summary):
+    ranks = _RANK_ORDERS.get(id(summary))
+    if ranks is None or ranks.summary_ref() is not summary:
+        ranks = RankOrder(summary)
+        _RANK_ORDERS[id(summary)] = ranks
+        weakref.finalize(summary, _RANK_ORDERS.pop, id(summary), None)
+    return ranks
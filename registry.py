@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from cache import CACHE, sizeof
+from compact import memory_usage
+from dataset import Dataset, fingerprint
+from models import RegistryUsage
+
+BUDGET_ENV = 'DASHBOARD_MEMORY_BUDGET_MB'
+DEFAULT_BUDGET_MB = 1024
+
+# Entity names are the frame's own categories, so only what each index adds is counted
+def _search_bytes(search_index):
+    return sum(
+        sizeof(index.folded) + sizeof(index.postings) + sum(sys.getsizeof(gram) for gram in index.postings)
+        + index.codes.nbytes + index.order.nbytes + index.offsets.nbytes
+        for index in search_index.entities.values()
+    )
+
+# The time index is a view of the ts column unless ts was stored at another resolution
+def _time_index_bytes(dataset):
+    ns = dataset.time_index.ns
+    return 0 if np.shares_memory(ns, dataset.df['ts'].array.asi8) else ns.nbytes
+
+# The frame and cube the stats read from are the dataset's own
+def _entity_stats_bytes(stats):
+    return sizeof(stats.tables) + sizeof(stats.base) + sizeof(stats.cell_order)
+
+def _dataset_bytes(dataset):
+    return int(
+        memory_usage(dataset.df) + sizeof(dataset.rollup) + (0 if dataset.uri_aliases is None else memory_usage(dataset.uri_aliases))
+        + _search_bytes(dataset.search_index) + _time_index_bytes(dataset)
+    )
+
+# Digest of the uploaded files' bytes plus whatever options change what is loaded from them
+def upload_digest(files, options=()):
+    digest = hashlib.blake2b(repr(options).encode(), digest_size=16)
+    for file in sorted(files, key=lambda file: file.name):
+        digest.update(file.name.encode())
+        digest.update(hashlib.blake2b(file.getvalue(), digest_size=16).digest())
+    return digest.hexdigest()
+
+class _Entry:
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.base_bytes = _dataset_bytes(dataset)
+        self.stats_bytes = 0
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+    # Entity stats are built on first use, usually after the dataset is registered
+    @property
+    def bytes(self):
+        if not self.stats_bytes and self.dataset.entity_stats_built:
+            self.stats_bytes = _entity_stats_bytes(self.dataset.entity_stats)
+        return self.base_bytes + self.stats_bytes
+
+# A session's hold on a shared dataset. Kept in st.session_state, so the hold is released
+# when the session (or the session's reference to this lease) goes away.
+class Lease:
+    def __init__(self, registry, dataset):
+        self.dataset = dataset
+        weakref.finalize(self, registry.release, dataset.fingerprint)
+
+# Process-wide datasets keyed by content fingerprint, so every session that loads the same
+# plays shares one Dataset and one set of cached analytics. Datasets no session holds stay
+# cached for re-uploads until the memory budget (raw data plus cached analytics) needs the
+# room; least recently used unheld datasets go first, then least recently used analytics.
+class DatasetRegistry:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = {}
+        # Digest of uploaded file contents -> fingerprint of the dataset built from them
+        self.uploads = {}
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            entry.last_used = time.monotonic()
+            return entry.dataset
+
+    # The dataset already built from uploads with this content digest, if still registered
+    def for_upload(self, upload_digest):
+        with self.lock:
+            digest = self.uploads.get(upload_digest)
+            return None if digest is None else self.get(digest)
+
+    def remember_upload(self, upload_digest, dataset):
+        with self.lock:
+            self.uploads[upload_digest] = dataset.fingerprint
+
+    # The shared Dataset for these prepared plays, built only if no session has it
+    def dataset_for(self, df, uri_aliases=None):
+        digest = fingerprint(df)
+        return self.get(digest) or Dataset(df, uri_aliases, digest=digest)
+
+    def lease(self, dataset):
+        with self.lock:
+            entry = self.entries.get(dataset.fingerprint)
+            if entry is None:
+                entry = self.entries[dataset.fingerprint] = _Entry(dataset)
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+            lease = Lease(self, entry.dataset)
+        self.enforce()
+        return lease
+
+    def release(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is not None:
+                entry.leases = max(entry.leases - 1, 0)
+                entry.last_used = time.monotonic()
+        self.enforce()
+
+    def _dataset_bytes(self):
+        return sum(entry.bytes for entry in self.entries.values())
+
+    def enforce(self):
+        with self.lock:
+            while self._dataset_bytes() + CACHE.bytes > self.budget_bytes:
+                unheld = [(entry.last_used, digest) for digest, entry in self.entries.items() if entry.leases == 0]
+                if unheld:
+                    digest = min(unheld)[1]
+                    del self.entries[digest]
+                    CACHE.discard(digest)
+                    self.uploads = {key: value for key, value in self.uploads.items() if value != digest}
+                elif not CACHE.evict_oldest():
+                    break
+                self.evictions += 1
+
+    def usage(self):
+        with self.lock:
+            return RegistryUsage(
+                datasets=len(self.entries),
+                sessions=sum(entry.leases for entry in self.entries.values()),
+                dataset_bytes=self._dataset_bytes(),
+                cache_bytes=CACHE.bytes,
+                budget_bytes=self.budget_bytes,
+                evictions=self.evictions
+            )
+
+REGISTRY = DatasetRegistry(int(float(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB)) * 1e6))
+CACHE.after_put = REGISTRY.enforce
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import instrument
+from models import BasicStats, LevelSummaries, RollupCube
+from analyticsFuncs import MS_MIN_CONVERSION, NS_PER_DAY, entity_names, histograms_from_slab, hour_slab, play_cells, polar_data_from_histograms, summarise_cells
+
+
+def _day_cells(df, day_base=0, row_base=0):
+    days, day_idx, hour_counts = hour_slab(df)
+    cells = play_cells(df, {'day': day_idx + day_base})
+    cells[['first_row', 'last_row']] += row_base
+    return days, cells, hour_counts
+
+def _cube(days, cells, hour_counts, names):
+    return RollupCube(
+        days=days,
+        day_offsets=np.searchsorted(cells['day'].to_numpy(), np.arange(len(days) + 1)),
+        cells=cells,
+        hour_counts=hour_counts,
+        names=names
+    )
+
+# The aggregation kernel's cells with the day as an extra key, so cells are sorted by
+# day and a date range is a contiguous slice of cube.cells. A Home page query then costs
+# O(days x active tracks) rather than O(plays).
+def build_cube(df):
+    days, cells, hour_counts = _day_cells(df)
+    return _cube(days, cells, hour_counts, entity_names(df))
+
+# The cube of df after plays from `since` on were added to the frame `cube` was built from.
+# Days before since's day keep their cells (codes remapped to df's categories), only the
+# rest is aggregated again. Returns None when old codes can't be remapped.
+def extend_cube(cube, df, since):
+    names = entity_names(df)
+    remaps = {entity: names[entity].get_indexer(cube.names[entity]) for entity in names}
+    if any((remap < 0).any() for remap in remaps.values()):
+        return None
+
+    since_day = pd.Timestamp(since).value // NS_PER_DAY
+    kept_days = np.searchsorted(cube.days, since_day)
+    kept = cube.cells.iloc[:cube.day_offsets[kept_days]].copy()
+    for entity, remap in remaps.items():
+        codes = kept[entity].to_numpy()
+        kept[entity] = np.where(codes >= 0, remap[codes], -1)
+    # Unsorted (e.g. parquet) categories can remap out of order; keep cells in key order
+    if not all((np.diff(remap) > 0).all() for remap in remaps.values()):
+        kept = kept.sort_values(['day'] + list(remaps), kind='stable', ignore_index=True)
+
+    ns = df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    row_start = np.searchsorted(ns, since_day * NS_PER_DAY)
+    days, cells, hour_counts = _day_cells(df.iloc[row_start:], day_base=kept_days, row_base=row_start)
+
+    return _cube(
+        np.concatenate([cube.days[:kept_days], days]),
+        pd.concat([kept, cells], ignore_index=True),
+        np.concatenate([cube.hour_counts[:kept_days], hour_counts]),
+        names
+    )
+
+def _day_bounds(cube, start, end):
+    start_day = pd.Timestamp(start).value // NS_PER_DAY
+    end_day = pd.Timestamp(end).value // NS_PER_DAY
+    return np.searchsorted(cube.days, start_day), np.searchsorted(cube.days, end_day)
+
+def cells_in_range(cube, start, end):
+    lo, hi = _day_bounds(cube, start, end)
+    return cube.cells.iloc[cube.day_offsets[lo]:cube.day_offsets[hi]]
+
+# Per active day in [start, end): (days since the epoch, ms played, plays)
+def daily_totals(cube, start, end):
+    lo, hi = _day_bounds(cube, start, end)
+    cells = cube.cells.iloc[cube.day_offsets[lo]:cube.day_offsets[hi]]
+    if cells.empty:
+        return cube.days[lo:hi], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Every cube day has at least one cell, so the segments are never empty
+    segments = cube.day_offsets[lo:hi] - cube.day_offsets[lo]
+    return (
+        cube.days[lo:hi],
+        np.add.reduceat(cells['total_ms'].to_numpy(), segments),
+        np.add.reduceat(cells['total_plays'].to_numpy(), segments)
+    )
+
+def _nunique(codes):
+    return codes[codes >= 0].nunique()
+
+def basic_stats(cube, start, end):
+    cells = cells_in_range(cube, start, end)
+    total_plays = int(cells['total_plays'].sum())
+    total_plays_no_skips = int(cells['plays_no_skips'].sum())
+
+    return BasicStats(
+        total_plays=total_plays,
+        total_plays_no_skips=total_plays_no_skips,
+        skip_percentage=1 - (total_plays_no_skips / total_plays),
+        total_minutes=cells['total_ms'].sum() / MS_MIN_CONVERSION,
+        unique_tracks=_nunique(cells['track']),
+        unique_artists=_nunique(cells['artist']),
+        unique_albums=_nunique(cells['album'])
+    )
+
+def range_summaries(cube, start, end):
+    cells = cells_in_range(cube, start, end)
+    return LevelSummaries(
+        songs=summarise_cells(cells, cube.names, 'track'),
+        artists=summarise_cells(cells, cube.names, 'artist'),
+        albums=summarise_cells(cells, cube.names, 'album')
+    )
+
+def temporal_histograms(cube, start, end):
+    lo, hi = _day_bounds(cube, start, end)
+    return histograms_from_slab(cube.days[lo:hi], cube.hour_counts[lo:hi])
+
+def polar_data(cube, start, end):
+    return polar_data_from_histograms(temporal_histograms(cube, start, end))
+
+instrument.instrument_module(globals())
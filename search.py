@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+import numpy as np
+from compact import ENTITY_COLUMNS
+
+SEARCH_ENTITIES = ['track', 'artist', 'album']
+NGRAM = 3
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+class EntityIndex:
+    def __init__(self, column):
+        self.names = column.cat.categories
+        self.folded = [name.casefold() for name in self.names]
+
+        postings = defaultdict(list)
+        for entity_id, name in enumerate(self.folded):
+            for gram in _ngrams(name):
+                postings[gram].append(entity_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+        # CSR layout: rows of entity i are order[offsets[i]:offsets[i + 1]], in dataset order
+        codes = column.cat.codes.to_numpy()
+        self.codes = codes
+        self.order = np.argsort(codes, kind='stable')
+        self.offsets = np.searchsorted(codes[self.order], np.arange(len(self.names) + 1))
+
+    def match(self, query, exact=False):
+        if exact:
+            if query in self.names:
+                return np.array([self.names.get_loc(query)])
+            return np.array([], dtype=np.int64)
+
+        query = query.casefold()
+        if len(query) < NGRAM:
+            return np.array([i for i, name in enumerate(self.folded) if query in name], dtype=np.int64)
+
+        candidates = None
+        for gram in sorted(_ngrams(query), key=lambda g: len(self.postings.get(g, ()))):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return np.array([], dtype=np.int64)
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        return np.array([i for i in candidates if query in self.folded[i]], dtype=np.int64)
+
+    def rows(self, entity_ids):
+        if len(entity_ids) == 0:
+            return np.array([], dtype=np.int64)
+        rows = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in entity_ids])
+        rows.sort()
+        return rows
+
+# Built once per dataset over the distinct track/artist/album names, so searches
+# resolve candidate entities from trigram postings and never scan the plays.
+class SearchIndex:
+    def __init__(self, df):
+        self.entities = {entity: EntityIndex(df[ENTITY_COLUMNS[entity]]) for entity in SEARCH_ENTITIES}
+
+    def rows(self, entity, query, exact=False):
+        index = self.entities[entity]
+        return index.rows(index.match(query, exact))
+
+    def refine(self, rows, entity, query, exact=False):
+        index = self.entities[entity]
+        return rows[np.isin(index.codes[rows], index.match(query, exact))]
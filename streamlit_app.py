@@ -1,38 +1,201 @@
+import functools
 import streamlit as st
 import pandas as pd
 import analyticsFuncs, markdown
-import plotly.express as px
 import plots
-import io
 import models
+import ingest
+import compact
+import rollup
+import cache
+import registry
+import precompute
+import instrument
+import timeseries
+import archive
+import tables
+import compare
 
 UPLOAD_FILES_HELP_TEXT = """
 Upload Spotify Data here. You can either upload the JSON files you download from Spotify or
-a previously saved Parquet file for faster loading. If you upload JSON files, they will be
-processed and you will have the option to save the combined dataset as a Parquet file for future use.
-Only JSON and Parquet files are supported.
+a previously saved .zip dataset (or older .parquet file) for faster loading. If you upload JSON
+files, they will be processed and you will have the option to save the combined dataset for future use.
+A saved .zip dataset can be loaded for just some of its years.
 """
 DOWNLOAD_FILE_HELP_TEXT = """
-You can download your current dataset as a Parquet file for faster loading next time.
+You can download your current dataset as a .zip of Parquet files (one per year) for faster loading next time.
 Simply provide a filename (without extension), hit enter, and click the download button.
 """
+PRECOMPUTE_POLL_SECONDS = 0.5
+MAX_CUSTOM_PERIODS = 6
+APPEND_HELP_TEXT = """
+Merge the uploaded files into the data already loaded instead of replacing it, e.g. a newer
+Spotify export or a saved Parquet file plus the JSON files of a later export. Plays that are
+already loaded are skipped.
+"""
 
 def reset():
     st.session_state.previous_rand = None
 
+# Lookups return the matching plays, or a NoMatch/AmbiguousMatch to show instead
+def show_lookup(result):
+    if isinstance(result, models.NoMatch):
+        st.write(result.message)
+        return None
+    if isinstance(result, models.AmbiguousMatch):
+        st.write(result.message)
+        st.dataframe(result.matches, width='stretch', hide_index=True)
+        return None
+    return result
+
+# Builds the Dataset for a set of uploads, or merges them into base. Returns it (None if
+# nothing could be loaded) with the notes (text, optional table) and errors to show about the load.
+# Zips without a year range aren't saved datasets and are skipped.
+def load_uploads(uploaded_files, base, year_ranges):
+    notes = []
+    errors = []
+    frames = []
+    for file in uploaded_files:
+        if file.name.endswith('.parquet'):
+            frames.append(pd.read_parquet(file))
+        elif file.name.endswith('.zip') and file.file_id in year_ranges:
+            first_year, last_year = year_ranges[file.file_id]
+            try:
+                with instrument.span('archive.read_archive'):
+                    frames.append(archive.read_archive(
+                        file,
+                        start=pd.Timestamp(year=first_year, month=1, day=1, tz='UTC'),
+                        end=pd.Timestamp(year=last_year + 1, month=1, day=1, tz='UTC'),
+                        columns=list(ingest.INGEST_COLUMNS)
+                    ))
+            except ValueError as error:
+                errors.append(f"Couldn't load {file.name}: {error}")
+    json_files = [file for file in uploaded_files if file.name.endswith('.json')]
+
+    loads = []
+    if frames:
+        loads.append(compact.concat_compact(frames) if len(frames) > 1 else frames[0])
+    if json_files:
+        df, ingest_report = ingest.load_json_files(json_files)
+        notes.append((f"Parsed {ingest_report.total_rows} rows from {len(ingest_report.files)} files in {ingest_report.seconds:.2f}s ({ingest_report.rows_per_sec:,.0f} rows/sec, {ingest_report.workers} workers)", ingest.report_table(ingest_report)))
+        loads.append(df)
+
+    for df in loads:
+        if base is None:
+            df, uri_aliases = ingest.prepare_dataset(df)
+            with instrument.span('dataset.Dataset'):
+                base = registry.REGISTRY.dataset_for(df, uri_aliases)
+            continue
+        base, append_report = base.append(df)
+        if append_report.new_rows:
+            notes.append((f"Added {append_report.new_rows} new plays from {append_report.first_new.date()} to {append_report.last_new.date()} ({append_report.duplicate_rows} already loaded, {append_report.dropped_rows} without track metadata) in {append_report.seconds:.2f}s", None))
+        else:
+            notes.append((f"No new plays to add ({append_report.duplicate_rows} already loaded)", None))
+    return base, notes, errors
+
+def precompute_status(job):
+    for name, error in job.errors():
+        st.warning(f"Couldn't prepare {name.lower()} in the background ({error}), it will be worked out when you open the page")
+    if job.done():
+        st.caption("All pages are ready")
+    else:
+        st.progress(job.completed() / len(job.names), text=f"Getting your pages ready: {', '.join(job.pending()).lower()}...")
+
+# Polls while the warm-up runs. Once it finishes, the page reruns once and draws the
+# final state without the timer.
+@st.fragment(run_every=PRECOMPUTE_POLL_SECONDS)
+def poll_precompute():
+    job = st.session_state.get('precompute')
+    if job is None or job.done():
+        st.rerun()
+    precompute_status(job)
+
+# Progress of the background warm-up started after an upload, shown on the Upload page
+def show_precompute():
+    job = st.session_state.get('precompute')
+    if job is None:
+        return
+    if job.done():
+        precompute_status(job)
+    else:
+        poll_precompute()
+
+# A page section that reruns on its own (a Streamlit fragment) when one of its widgets
+# changes, drawn from the inputs it was given on the last full run. With the performance
+# panel on, a section rerun shows how long it took.
+def section(func):
+    @functools.wraps(func)
+    def run_section(*args, **kwargs):
+        with instrument.section(func.__name__, enabled=st.session_state.get('perf_panel', False), allocations=st.session_state.get('perf_allocations', False)) as timing:
+            func(*args, **kwargs)
+        if timing.profile is not None and st.session_state.get('perf_panel'):
+            st.caption(f"Section rerun: {timing.profile.seconds * 1000:.0f} ms ({timing.profile.cache_hits} cache hits, {timing.profile.cache_misses} cache misses)")
+    return st.fragment(run_section)
+
+@section
+def time_series_section(series, max_points):
+    plots.make_mins_and_streams_plots(series, max_points)
+
+@section
+def table_toggle_section(label, data, help=None):
+    if st.checkbox(label, help=help):
+        table_section(data, label)
+
+# A paged table, so flipping pages or sorting reruns only the table
+@section
+def table_section(data, key, hide_index=True):
+    tables.paged_table(data, key, hide_index=hide_index)
+
+@section
+def top_songs_section(song_summaries, start_date, end_date):
+    col1, col2 = st.columns(2)
+    with col1:
+        st.title("Track Analytics")
+    with col2:
+        show_uri = st.checkbox("Show URIs?")
+    st.write(f"Encompassing date range from {start_date.date()} to {end_date.date()}")
+
+    top_songs = analyticsFuncs.rank_songs(song_summaries, show_uri=show_uri)
+    st.write(f"Top {models.Config.top_n} songs by number of plays")
+    st.dataframe(top_songs.by_plays, hide_index=True)
+    st.write(f"Top {models.Config.top_n} songs with no skips")
+    st.dataframe(top_songs.by_no_skips, hide_index=True)
+    st.write(f"Top {models.Config.top_n} songs by minutes listened to")
+    st.dataframe(top_songs.by_minutes, hide_index=True)
+    st.write(f"Top {models.Config.top_n} songs by average listen time")
+    st.dataframe(top_songs.by_mean_minutes, hide_index=True)
+    st.write(f"Top {models.Config.top_n} songs by lowest skip percentage (where a song has at least {models.Config.min_plays_skip_analysis} plays)")
+    st.dataframe(top_songs.lowest_skip, hide_index=True)
+    st.write(f"Top {models.Config.top_n} songs by highest skip percentage (where a song has at least {models.Config.min_plays_skip_analysis} plays)")
+    st.dataframe(top_songs.highest_skip, hide_index=True)
+    st.divider()
+    st.write(f"Full song summary statistics for period {start_date.date()} to {end_date.date()}")
+    table_section(st.session_state.dataset.range_view(top_songs.all_data, ('top_songs', show_uri), start_date, end_date), 'top_songs')
+
 st.set_page_config(page_title="Music Analytics", layout="wide", page_icon='logo.jpg')
 
 if 'data' not in st.session_state:
     st.session_state.data = None
+    st.session_state.dataset = None
     st.session_state.has_inital_data = False
 if 'page' not in st.session_state:
     st.session_state.page = 'Upload'
 if st.session_state.data is not None:
     st.logo('logo.jpg', size='large')
     st.sidebar.title("Navigate")
-    page = st.sidebar.radio("Navigate", ['Upload', 'Home', 'Track', 'Artist', 'Album'])
+    page = st.sidebar.radio("Navigate", ['Upload', 'Home', 'Track', 'Artist', 'Album', 'Compare'])
     st.session_state.page = page
     st.sidebar.markdown("Checkout the [GitHub Repository](https://github.com/Sam197/Spotify-Analytics-Dashboard)!")
+    cache_info = cache.cache_info()
+    usage = registry.REGISTRY.usage()
+    st.sidebar.caption(f"Analytics cache: {cache_info.hits} hits, {cache_info.misses} misses, {cache_info.entries} entries")
+    st.sidebar.caption(f"Memory: {(usage.dataset_bytes + usage.cache_bytes) / 1e6:.0f} of {usage.budget_bytes / 1e6:.0f} MB ({usage.datasets} datasets for {usage.sessions} sessions, {usage.cache_bytes / 1e6:.0f} MB cached analytics)")
+    with st.sidebar.expander("Debug"):
+        st.checkbox("Show performance panel", key='perf_panel')
+        st.checkbox("Track allocations (slower)", key='perf_allocations', disabled=not st.session_state.get('perf_panel'))
+        st.checkbox("Full-resolution line charts", key='full_charts', help="Send every point of the time series charts to the browser instead of a shape-preserving sample")
+chart_points = None if st.session_state.get('full_charts') else plots.MAX_LINE_POINTS
+instrument.begin_run(st.session_state.page, enabled=st.session_state.get('perf_panel', False), allocations=st.session_state.get('perf_allocations', False))
 if 'previous_rand' not in st.session_state:
     st.session_state.previous_rand = None
 
@@ -47,80 +210,113 @@ if st.session_state.page == 'Upload' or st.session_state.data is None:
     
     uploaded_files = st.file_uploader(
         "Choose files",
-        type=['json', 'parquet'],
+        type=['json', 'zip', 'parquet'],
         help=UPLOAD_FILES_HELP_TEXT,
         accept_multiple_files=True
     )
 
-    if uploaded_files is not None and uploaded_files != []:
-        if any([file.name.endswith('.parquet') for file in uploaded_files]):
-            df = pd.read_parquet(uploaded_files[0])
-            
-        else:
-            alldata = pd.concat([pd.read_json(path) for path in uploaded_files])
-            coldrop = ["ip_addr", "episode_show_name", 'audiobook_title', 'audiobook_uri', 'audiobook_chapter_uri', 'audiobook_chapter_title', 'episode_name', 'spotify_episode_uri']
-            df = alldata.drop(columns=coldrop)
-            df['ts'] = pd.to_datetime(df['ts'])
-
-            uri_mapping = df.groupby(['master_metadata_track_name', 'master_metadata_album_artist_name'])['spotify_track_uri'].first().reset_index()
-            df = df.merge(uri_mapping, on=['master_metadata_track_name', 'master_metadata_album_artist_name'], suffixes=('_old', ''))
-            df = df.drop(columns=['spotify_track_uri_old'])
+    append = False
+    if st.session_state.dataset is not None:
+        append = st.checkbox("Add to the current data", help=APPEND_HELP_TEXT)
 
-        st.session_state.data = df.copy(deep=True)
-            
-        st.success(f"✅ Successfully loaded {len(df)} rows and {len(df.columns)} columns!")
-        
-        if not st.session_state.has_inital_data:
-            st.write("Loading Landing Page!")
-
-        if not st.session_state.has_inital_data:
-            st.session_state.has_inital_data = True
-            st.rerun()
+    if uploaded_files is not None and uploaded_files != []:
+        year_ranges = {}
+        for file in uploaded_files:
+            if file.name.endswith('.zip'):
+                years = archive.archive_years(file)
+                if not years:
+                    st.error(f"{file.name} isn't a saved dataset, so it was skipped. For a Spotify export zip, upload the JSON files inside it instead.")
+                elif len(years) > 1:
+                    year_ranges[file.file_id] = st.select_slider(f"Years to load from {file.name}", options=years, value=(years[0], years[-1]))
+                else:
+                    year_ranges[file.file_id] = (years[0], years[0])
+
+        # Reruns with the same uploads and options keep the dataset already built from them
+        upload_key = (tuple(file.file_id for file in uploaded_files), append, tuple(year_ranges.items()))
+        if upload_key != st.session_state.get('upload_key'):
+            base = st.session_state.dataset if append else None
+            # Another session may already have loaded exactly these files
+            digest = registry.upload_digest(uploaded_files, (None if base is None else base.fingerprint, sorted(year_ranges.values())))
+            shared = registry.REGISTRY.for_upload(digest)
+            if shared is None:
+                shared, st.session_state.upload_notes, st.session_state.upload_errors = load_uploads(uploaded_files, base, year_ranges)
+                if shared is not None:
+                    registry.REGISTRY.remember_upload(digest, shared)
+            else:
+                st.session_state.upload_notes = [("Already loaded in another session, sharing its data", None)]
+                st.session_state.upload_errors = []
+            # Nothing loaded keeps whatever data was there before
+            if shared is not None:
+                st.session_state.lease = registry.REGISTRY.lease(shared)
+                st.session_state.dataset = st.session_state.lease.dataset
+                st.session_state.data = st.session_state.dataset.df
+                st.session_state.precompute = precompute.start(st.session_state.dataset, st.session_state.get('precompute'))
+            st.session_state.upload_key = upload_key
+
+        for error in st.session_state.upload_errors:
+            st.error(error)
+        for note, table in st.session_state.upload_notes:
+            if table is None:
+                st.info(note)
+            else:
+                with st.expander(note):
+                    st.dataframe(table, hide_index=True)
+        df = st.session_state.data
+        if df is not None:
+            show_precompute()
+            st.success(f"✅ Successfully loaded {len(df)} rows and {len(df.columns)} columns! ({st.session_state.dataset.memory_bytes / 1e6:.1f} MB in memory)")
+
+            if not st.session_state.has_inital_data:
+                st.write("Loading Landing Page!")
+
+            if not st.session_state.has_inital_data:
+                st.session_state.has_inital_data = True
+                st.rerun()
     else:
         if not st.session_state.has_inital_data:
-            st.info("Please upload .json files, or a .parquet file to begin analysis")
+            st.info("Please upload .json files, or a saved .zip or .parquet file to begin analysis")
         else:
             st.info("You can analyse different data if you upload new stuff here!")
 
     if st.session_state.has_inital_data:
         st.write("Do you want to save the loaded dataset for quicker uploads next time?")
 
-        buffer = io.BytesIO()
-        st.session_state.data.to_parquet(buffer, index=False)
         col1, col2 = st.columns([5,1])
         with col1:
             filename = st.text_input("Enter filename to save as (without extension)", placeholder="my_spotify_data", help=DOWNLOAD_FILE_HELP_TEXT)
         with col2:
             st.markdown("<br>", unsafe_allow_html=True)
-            st.write("**.parquet**  ")
+            st.write("**.zip**  ")
         
         if not filename:
-            final_filename = "my_spotify_data.parquet"
+            final_filename = "my_spotify_data.zip"
         else:
             # Check if they accidentally typed the extension anyway
-            if filename.endswith(".parquet"):
+            if filename.endswith(".zip"):
                 final_filename = filename
             else:
-                final_filename = f"{filename}.parquet"
+                final_filename = f"{filename}.zip"
 
         st.download_button(
             "Download Current Dataset",
-            data=buffer.getvalue(),
+            # Built only when clicked, and once per dataset
+            data=st.session_state.dataset.export_archive,
             file_name=final_filename,
-            mime="application/octet-stream"
+            mime="application/zip"
         )
 
         st.divider()
         st.subheader("Your Data")
-        st.dataframe(st.session_state.data)
+        table_section(st.session_state.dataset.view(), 'your_data', hide_index=False)
 
 if st.session_state.page == "Home":
     df = st.session_state.data
     st.title("Whole Listening History Overview")
     st.divider()
 
-    min_date = df['ts'].min().date()
-    max_date = df['ts'].max().date() + pd.Timedelta('1d')
+    time_index = st.session_state.dataset.time_index
+    min_date = time_index.first.date()
+    max_date = time_index.last.date() + pd.Timedelta('1d')
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Want to look at a certain date range?")
@@ -138,11 +334,11 @@ if st.session_state.page == "Home":
         start_date, end_date = selected_dates
     start_date = pd.to_datetime(start_date).tz_localize('UTC')
     end_date = pd.to_datetime(end_date).tz_localize('UTC')   
-    mask = (df['ts'] >= start_date) & (df['ts'] <= end_date)
-    filtered_df = df.loc[mask]
+    with instrument.span('timeindex.slice'):
+        filtered_df = time_index.slice(df, start_date, end_date)
 
     col1, col2, col3, col4 = st.columns(4)
-    basic_stats = analyticsFuncs.basicStats(filtered_df)
+    basic_stats = rollup.basic_stats(st.session_state.dataset.rollup, start_date, end_date)
     with col1:
         st.metric("Total Plays", basic_stats.total_plays)
     with col2:
@@ -173,45 +369,25 @@ if st.session_state.page == "Home":
     st.divider()
 
     st.subheader("When Do You Listen?")
-    polar_plot_data = analyticsFuncs.get_data_for_polar_plots(filtered_df)
-    polar_plots = plots.make_polar_plots(polar_plot_data)
+    histograms = rollup.temporal_histograms(st.session_state.dataset.rollup, start_date, end_date)
+    polar_plots = plots.make_polar_plots(analyticsFuncs.polar_data_from_histograms(histograms))
     plots.plot_polar_plots(polar_plots)
+    st.plotly_chart(plots.make_hour_weekday_heatmap(histograms), width='stretch')
 
     st.divider()
     st.subheader("Graph - Yipee")
 
-    plots.make_mins_and_streams_plots(filtered_df)
+    time_series_section(st.session_state.dataset.time_series(start_date, end_date), chart_points)
 
     st.divider()
-    col1, col2 = st.columns(2)
-    with col1:
-        st.title("Track Analytics")
-    with col2:
-        show_uri = st.checkbox("Show URIs?")
-    st.write(f"Encompassing date range from {start_date.date()} to {end_date.date()}")
-
-    top_songs = analyticsFuncs.top_songs(filtered_df, show_uri=show_uri)
-    st.write(f"Top {models.Config.top_n} songs by number of plays")
-    st.dataframe(top_songs.by_plays, hide_index=True)
-    st.write(f"Top {models.Config.top_n} songs with no skips")
-    st.dataframe(top_songs.by_no_skips, hide_index=True)
-    st.write(f"Top {models.Config.top_n} songs by minutes listened to")
-    st.dataframe(top_songs.by_minutes, hide_index=True)
-    st.write(f"Top {models.Config.top_n} songs by average listen time")
-    st.dataframe(top_songs.by_mean_minutes, hide_index=True)
-    st.write(f"Top {models.Config.top_n} songs by lowest skip percentage (where a song has at least {models.Config.min_plays_skip_analysis} plays)")
-    st.dataframe(top_songs.lowest_skip, hide_index=True)
-    st.write(f"Top {models.Config.top_n} songs by highest skip percentage (where a song has at least {models.Config.min_plays_skip_analysis} plays)")
-    st.dataframe(top_songs.highest_skip, hide_index=True)
-    st.divider()
-    st.write(f"Full song summary statistics for period {start_date.date()} to {end_date.date()}")
-    st.dataframe(top_songs.all_data, hide_index=True)
+    range_summaries = st.session_state.dataset.range_summaries(start_date, end_date)
+    top_songs_section(range_summaries.songs, start_date, end_date)
 
     st.divider()
     st.title("Artists")
     st.write(f"Encompassing date range from {start_date.date()} to {end_date.date()}")
 
-    top_artists = analyticsFuncs.top_artists(filtered_df)
+    top_artists = analyticsFuncs.rank_artists(range_summaries.artists)
     st.write(f"Top {models.Config.top_n} artists by number of plays")
     st.dataframe(top_artists.by_plays, hide_index=True)
     st.write(f"Top {models.Config.top_n} artists by number of full plays (no skips)")
@@ -226,13 +402,13 @@ if st.session_state.page == "Home":
     st.dataframe(top_artists.highest_skip, hide_index=True)
     st.divider()
     st.write(f"Full artist summary statistics for period {start_date.date()} to {end_date.date()}")
-    st.dataframe(top_artists.all_data, hide_index=True)
+    table_section(st.session_state.dataset.range_view(top_artists.all_data, 'top_artists', start_date, end_date), 'top_artists')
 
     st.divider()
     st.title("Albums")
     st.write(f"Encompassing date range from {start_date.date()} to {end_date.date()}")
     
-    top_albums = analyticsFuncs.top_albums(filtered_df)
+    top_albums = analyticsFuncs.rank_albums(range_summaries.albums)
     st.write(f"Top {models.Config.top_n} albums by number of plays")
     st.dataframe(top_albums.by_plays, hide_index=True)
     st.write(f"Top {models.Config.top_n} albums by number of full plays (no skips)")
@@ -247,7 +423,7 @@ if st.session_state.page == "Home":
     st.dataframe(top_albums.highest_skip, hide_index=True)
     st.divider()
     st.write(f"Full album summary statistics for period {start_date.date()} to {end_date.date()}")
-    st.dataframe(top_albums.all_data, hide_index=True)
+    table_section(st.session_state.dataset.range_view(top_albums.all_data, 'top_albums', start_date, end_date), 'top_albums')
 
 elif st.session_state.page == 'Track':
 
@@ -279,19 +455,25 @@ elif st.session_state.page == 'Track':
     if search_keyword != "":
         #When looking for a song, if multiple it will show the correct collated listens across all albums, but when filtering, it can be wrong
         #E.g. try radioactive my imagine dragons
-        song_history = analyticsFuncs.get_song_stats(st.session_state.data, search_keyword, exact=exact, artist=artist, album=album)
+        song_history = show_lookup(analyticsFuncs.get_song_stats(st.session_state.data, search_keyword, exact=exact, artist=artist, album=album, index=st.session_state.dataset.search_index))
 
     if song_history is not None:
-        summary_song_data = analyticsFuncs.song_sum_stats(song_history)
+        summary_song_data = analyticsFuncs.song_sum_stats(song_history, entity_stats=st.session_state.dataset.entity_stats)
         markdown.summary_song_markdown(summary_song_data)
-        plots.make_mins_and_streams_plots(song_history)
+        uri_aliases = st.session_state.dataset.uri_aliases
+        merged_versions = uri_aliases[uri_aliases['spotify_track_uri'] == song_history['spotify_track_uri'].iloc[0]]
+        if not merged_versions.empty:
+            with st.expander(f"Merged from {len(merged_versions)} versions of this song"):
+                st.dataframe(merged_versions.rename(columns={'alias_uri': 'URI', 'album_name': 'Album', 'plays': 'Listens'}).drop(columns=['spotify_track_uri']), hide_index=True)
+        song_view = st.session_state.dataset.entity_view(song_history, ('track', search_keyword, exact, artist, album))
+        time_series_section(timeseries.time_series(song_view), chart_points)
         st.divider()
         st.write("When did you listen?")
-        time_dfs = analyticsFuncs.get_data_for_polar_plots(song_history)
-        polar_plots = plots.make_polar_plots(time_dfs)
+        histograms = analyticsFuncs.temporal_histograms(song_view)
+        polar_plots = plots.make_polar_plots(analyticsFuncs.polar_data_from_histograms(histograms))
         plots.plot_polar_plots(polar_plots)
-        if st.checkbox("See Full Listening History for this Song?", help="This shows all times this song was listened to, drawn straight from your raw Spotify data."):
-            st.dataframe(song_history, hide_index=True)
+        st.plotly_chart(plots.make_hour_weekday_heatmap(histograms), width='stretch')
+        table_toggle_section("See Full Listening History for this Song?", song_view, help="This shows all times this song was listened to, drawn straight from your raw Spotify data.")
 
 elif st.session_state.page == 'Artist':
 
@@ -312,42 +494,39 @@ elif st.session_state.page == 'Artist':
         exact = True
 
     if search_keyword != "":
-        artist_hist = analyticsFuncs.get_artist_hist(st.session_state.data, search_keyword, exact=exact)
+        artist_hist = show_lookup(analyticsFuncs.get_artist_hist(st.session_state.data, search_keyword, exact=exact, index=st.session_state.dataset.search_index))
         if artist_hist is not None:
-            artist_sum_stats = analyticsFuncs.artist_album_sum_stats(artist_hist, artist=True)
+            artist_view = st.session_state.dataset.entity_view(artist_hist, ('artist', search_keyword, exact))
+            artist_sum_stats = analyticsFuncs.artist_album_sum_stats(artist_hist, artist=True, entity_stats=st.session_state.dataset.entity_stats)
             markdown.summary_artist_album_markdown(artist_sum_stats, artist=True)
 
             if artist_sum_stats.unique_songs > models.Config.top_n:
-                see_all_songs = st.checkbox(f"See all songs? ({artist_sum_stats.unique_songs})")
-                if see_all_songs:
-                    st.dataframe(artist_sum_stats.full_hist, hide_index=True)
+                table_toggle_section(f"See all songs? ({artist_sum_stats.unique_songs})", artist_sum_stats.full_hist)
 
             st.plotly_chart(plots.make_pie_chart_track(artist_sum_stats.full_hist), width='stretch')
     
-            top_albums_for_artist = analyticsFuncs.top_albums(artist_hist, single=True)
+            top_albums_for_artist = analyticsFuncs.top_albums(artist_view, single=True)
             top_albums_for_artist.drop(columns=['artist_name'], inplace=True)
             st.subheader("Top Albums for this Artist")
             st.write(f"Top {models.Config.top_n} albums by number of plays")
             st.dataframe(top_albums_for_artist.head(models.Config.top_n), hide_index=True)
             if artist_sum_stats.unique_albums > models.Config.top_n:
-                see_all_albums = st.checkbox(f"See all albums? ({artist_sum_stats.unique_albums})")
-                if see_all_albums:
-                    st.dataframe(top_albums_for_artist, hide_index=True)
+                table_toggle_section(f"See all albums? ({artist_sum_stats.unique_albums})", top_albums_for_artist)
             
             st.plotly_chart(plots.make_pie_chart_album(top_albums_for_artist), width='stretch')
         
-            plots.make_mins_and_streams_plots(artist_hist)
+            time_series_section(timeseries.time_series(artist_view), chart_points)
 
             st.divider()
             st.subheader("When did you listen?")
             st.write(f"For the time period {artist_hist['ts'].min().date()} to {artist_hist['ts'].max().date()}")
-            time_dfs = analyticsFuncs.get_data_for_polar_plots(artist_hist)
-            polar_plots = plots.make_polar_plots(time_dfs)
+            histograms = analyticsFuncs.temporal_histograms(artist_view)
+            polar_plots = plots.make_polar_plots(analyticsFuncs.polar_data_from_histograms(histograms))
             plots.plot_polar_plots(polar_plots)
+            st.plotly_chart(plots.make_hour_weekday_heatmap(histograms), width='stretch')
 
         if artist_hist is not None:
-            if st.checkbox("See Full Listening History for this Artist?", help="This shows all times a song from this artist was listened to, drawn straight from your raw Spotify data."):
-                st.dataframe(artist_hist, hide_index=True)
+            table_toggle_section("See Full Listening History for this Artist?", artist_view, help="This shows all times a song from this artist was listened to, drawn straight from your raw Spotify data.")
 
 elif st.session_state.page == 'Album':
 
@@ -368,28 +547,80 @@ elif st.session_state.page == 'Album':
         exact = True
 
     if search_keyword != "":
-        album_hist = analyticsFuncs.get_album_hist(st.session_state.data, search_keyword, exact=exact)
+        album_hist = show_lookup(analyticsFuncs.get_album_hist(st.session_state.data, search_keyword, exact=exact, index=st.session_state.dataset.search_index))
         if album_hist is not None:
-            album_sum_stats = analyticsFuncs.artist_album_sum_stats(album_hist, album=True)
+            album_sum_stats = analyticsFuncs.artist_album_sum_stats(album_hist, album=True, entity_stats=st.session_state.dataset.entity_stats)
             markdown.summary_artist_album_markdown(album_sum_stats, album=True)
 
     if album_hist is not None and album_sum_stats.unique_songs > models.Config.top_n:
-        see_all_songs = st.checkbox(f"See all songs? ({album_sum_stats.unique_songs})")
-        if see_all_songs:
-            st.dataframe(album_sum_stats.full_hist, hide_index=True)
+        table_toggle_section(f"See all songs? ({album_sum_stats.unique_songs})", album_sum_stats.full_hist)
         
     if album_hist is not None:
         st.plotly_chart(plots.make_pie_chart_track(album_sum_stats.full_hist, album=True), width='stretch')
         
-        plots.make_mins_and_streams_plots(album_hist)
+        album_view = st.session_state.dataset.entity_view(album_hist, ('album', search_keyword, exact))
+        time_series_section(timeseries.time_series(album_view), chart_points)
 
         st.divider()
         st.subheader("When did you listen?")
         st.write(f"For the time period {album_hist['ts'].min().date()} to {album_hist['ts'].max().date()}")
-        time_dfs = analyticsFuncs.get_data_for_polar_plots(album_hist)
-        polar_plots = plots.make_polar_plots(time_dfs)
+        histograms = analyticsFuncs.temporal_histograms(album_view)
+        polar_plots = plots.make_polar_plots(analyticsFuncs.polar_data_from_histograms(histograms))
         plots.plot_polar_plots(polar_plots)
+        st.plotly_chart(plots.make_hour_weekday_heatmap(histograms), width='stretch')
 
     if album_hist is not None:
-        if st.checkbox("See Full Listening History for this Album?", help="This shows all times a song from this album was listened to, drawn straight from your raw Spotify data."):
-            st.dataframe(album_hist, hide_index=True)
\ No newline at end of file
+        table_toggle_section("See Full Listening History for this Album?", album_view, help="This shows all times a song from this album was listened to, drawn straight from your raw Spotify data.")
+
+elif st.session_state.page == 'Compare':
+
+    st.title("Compare Periods")
+    st.write("Put years, quarters, months or your own date ranges side by side to see what changed.")
+    first_day, end_day = st.session_state.dataset.full_range()
+    grain = st.radio("Compare", list(compare.GRAINS) + ['Custom'], horizontal=True)
+
+    periods = []
+    if grain == 'Custom':
+        count = st.number_input("Number of date ranges", min_value=2, max_value=MAX_CUSTOM_PERIODS, value=2)
+        # Start from the latest years, or quarters or months when there aren't enough of them
+        for freq in compare.GRAINS.values():
+            defaults = compare.available_periods(first_day, end_day, freq)
+            if len(defaults) >= count:
+                break
+        for i, col in enumerate(st.columns(count)):
+            default = defaults[max(0, len(defaults) - count + i)]
+            with col:
+                # Keyed by count too, so changing it brings up a fresh set of defaults
+                dates = st.date_input(f"Range {i + 1}", value=[default.start.date(), default.end.date()], key=f'compare_range_{count}_{i}')
+            if len(dates) == 2:
+                periods.append(compare.date_period(*dates))
+        # The same range twice would only repeat its columns
+        unique = list(dict.fromkeys(periods))
+        if len(unique) < len(periods):
+            st.warning(f"Left out {len(periods) - len(unique)} range(s) repeating an earlier one")
+        periods = unique
+    else:
+        options = compare.available_periods(first_day, end_day, compare.GRAINS[grain])
+        labels = [period.label for period in options]
+        chosen = st.multiselect("Periods", labels, default=labels[-2:])
+        periods = [period for period in options if period.label in chosen]
+
+    if len(periods) < 2:
+        st.info("Pick at least two periods to compare")
+    else:
+        comparison = st.session_state.dataset.compare(periods)
+        st.subheader("Overall")
+        st.dataframe(comparison.totals, hide_index=True)
+        for title, level in [('Songs', comparison.songs), ('Artists', comparison.artists), ('Albums', comparison.albums)]:
+            st.divider()
+            st.subheader(title)
+            st.plotly_chart(plots.make_rank_chart(level.ranks, f"Rank movement of the top {models.Config.top_n} {title.lower()}"), width='stretch')
+            st.write("Each period's plays, minutes, skip percentage and rank, then its change from the period before (a positive rank change is a climb)")
+            table_section(st.session_state.dataset.comparison_view(level.table, f'compare_{title.lower()}', periods), f'compare_{title.lower()}')
+
+profile = instrument.end_run()
+if profile is not None and st.session_state.get('perf_panel'):
+    with st.sidebar.expander(f"Performance: {profile.seconds * 1000:.0f} ms this rerun", expanded=True):
+        st.caption(f"{len(profile.spans)} spans, {profile.cache_hits} cache hits, {profile.cache_misses} cache misses")
+        st.dataframe(instrument.totals_by_name(profile), hide_index=True)
+        st.dataframe(instrument.span_table(profile), hide_index=True)
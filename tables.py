@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+import instrument
+from cache import DataView, memoize
+from models import TablePage
+
+PAGE_SIZES = [25, 50, 100, 250]
+DEFAULT_PAGE_SIZE = 50
+
+def _frame(data):
+    return data.df if isinstance(data, DataView) else data
+
+# Sort orders and filter matches are cached by the view's key; plain DataFrames are
+# worked out each time, as there is no cheap key for them
+def _cached(name, func, data, *args):
+    if isinstance(data, DataView):
+        return memoize((name, data.key) + args, func, data.df, *args)
+    return func(data, *args)
+
+def text_columns(df):
+    return [
+        column for column in df.columns
+        if isinstance(df[column].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(df[column].dtype)
+    ]
+
+# Row positions of df in column order, missing values last. Ties keep the table's order.
+def _sort_order(df, column, ascending):
+    values = df[column].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+def _contains(values, text):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Match each category once; code -1 (missing) picks the trailing False
+        hits = np.asarray(values.cat.categories.astype(str).str.contains(text, case=False, regex=False), dtype=bool)
+        return np.append(hits, False)[values.cat.codes.to_numpy()]
+    if values.dtype == object:
+        values = values.astype(str)
+    return values.str.contains(text, case=False, regex=False, na=False).to_numpy(dtype=bool)
+
+# Row positions of df where the column (or any text column, for None) contains text
+def _filter_rows(df, column, text):
+    columns = [column] if column is not None else text_columns(df)
+    matched = np.zeros(len(df), dtype=bool)
+    for name in columns:
+        matched |= _contains(df[name], text)
+    return np.flatnonzero(matched)
+
+# One page of data, sorted and filtered; only these rows are sent to the browser
+def table_page(data, sort_column=None, ascending=True, filter_column=None, text='', page=1, page_size=DEFAULT_PAGE_SIZE):
+    df = _frame(data)
+    rows = None
+    if sort_column is not None:
+        rows = _cached('sort_order', _sort_order, data, sort_column, ascending)
+    if text:
+        matched = _cached('filter_rows', _filter_rows, data, filter_column, text)
+        if rows is None:
+            rows = matched
+        else:
+            keep = np.zeros(len(df), dtype=bool)
+            keep[matched] = True
+            rows = rows[keep[rows]]
+
+    matched_rows = len(df) if rows is None else len(rows)
+    pages = max(1, -(-matched_rows // page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    stop = min(start + page_size, matched_rows)
+    page_rows = df.iloc[start:stop] if rows is None else df.iloc[rows[start:stop]]
+    return TablePage(
+        rows=page_rows,
+        total_rows=len(df),
+        matched_rows=matched_rows,
+        page=page,
+        pages=pages,
+        first_row=start + 1 if stop > start else 0,
+        last_row=stop
+    )
+
+# A table that only sends the visible page. Small tables are shown whole, where the
+# browser can sort them itself. key must be unique on the page.
+def paged_table(data, key, hide_index=True):
+    df = _frame(data)
+    if len(df) <= PAGE_SIZES[0]:
+        st.dataframe(df, hide_index=hide_index)
+        return
+
+    page_key = f'{key}_page'
+    def first_page():
+        st.session_state[page_key] = 1
+
+    col1, col2, col3, col4 = st.columns([2, 1, 2, 3])
+    with col1:
+        sort_column = st.selectbox("Sort by", [None, *df.columns], format_func=lambda column: "Original order" if column is None else column, key=f'{key}_sort', on_change=first_page)
+    with col2:
+        descending = st.toggle("Descending", key=f'{key}_descending', on_change=first_page, disabled=sort_column is None)
+    with col3:
+        filter_column = st.selectbox("Filter on", [None, *text_columns(df)], format_func=lambda column: "Any text column" if column is None else column, key=f'{key}_filter_column', on_change=first_page)
+    with col4:
+        text = st.text_input("Filter", placeholder="Text to look for", key=f'{key}_filter', on_change=first_page)
+    page_size = st.session_state.get(f'{key}_size', DEFAULT_PAGE_SIZE)
+
+    result = table_page(data, sort_column, not descending, filter_column, text, st.session_state.get(page_key, 1), page_size)
+    # The page may be past the end after the data changed
+    st.session_state[page_key] = result.page
+    st.dataframe(result.rows, hide_index=hide_index)
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        st.number_input("Page", min_value=1, max_value=result.pages, step=1, key=page_key)
+    with col2:
+        st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f'{key}_size', on_change=first_page)
+    with col3:
+        filtered = f" (filtered from {result.total_rows:,})" if result.matched_rows != result.total_rows else ""
+        st.caption(f"Rows {result.first_row:,}-{result.last_row:,} of {result.matched_rows:,}{filtered}, page {result.page} of {result.pages}")
+
+instrument.instrument_module(globals())
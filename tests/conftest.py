@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+from benchmarks.generate import generate_frame
+from dataset import Dataset
+
+ROWS = 20000
+
+@pytest.fixture(scope='session')
+def raw():
+    return generate_frame(ROWS, seed=1, years=3)
+
+@pytest.fixture(scope='session')
+def dataset(raw):
+    df, uri_aliases = ingest.prepare_dataset(raw)
+    return Dataset(df, uri_aliases)
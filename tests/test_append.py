@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+import rollup
+from benchmarks.generate import write_json
+from dataset import Dataset
+
+def _as_text(df):
+    return df.reset_index(drop=True).astype(object).fillna('<NA>').astype(str)
+
+# Cells with their codes swapped for names and put in name order, since the codes
+# (and so the order of cells within a day) depend on the category order
+def _decoded_cells(cube):
+    cells = cube.cells.copy()
+    for entity, names in cube.names.items():
+        codes = cells[entity].to_numpy()
+        cells[entity] = np.where(codes >= 0, np.asarray(names, dtype=object)[codes], None)
+    cells = _as_text(cells)
+    return cells.sort_values(list(cells.columns), ignore_index=True)
+
+def _aliases(uri_aliases):
+    return _as_text(uri_aliases.sort_values(['spotify_track_uri', 'alias_uri']))
+
+@pytest.fixture(scope='module')
+def exports(raw, tmp_path_factory):
+    raw = raw[list(ingest.INGEST_COLUMNS)]
+    # The newer export repeats the last 20% of the older one
+    older = raw.iloc[:int(len(raw) * 0.7)].reset_index(drop=True)
+    newer_paths = write_json(raw.iloc[int(len(raw) * 0.5):], str(tmp_path_factory.mktemp('newer')))
+    newer, _ = ingest.load_json_files(newer_paths)
+    return raw, older, newer
+
+def test_append_matches_full_load(exports):
+    raw, older, newer = exports
+    merged, report = Dataset(*ingest.prepare_dataset(older)).append(newer)
+    full = Dataset(*ingest.prepare_dataset(raw))
+
+    assert report.new_rows == len(full.df) - report.existing_rows
+    assert report.duplicate_rows > 0
+    pd.testing.assert_frame_equal(_as_text(merged.df), _as_text(full.df[merged.df.columns]))
+    pd.testing.assert_frame_equal(_decoded_cells(merged.rollup), _decoded_cells(full.rollup))
+    assert np.array_equal(merged.rollup.days, full.rollup.days)
+    assert np.array_equal(merged.rollup.hour_counts, full.rollup.hour_counts)
+    pd.testing.assert_frame_equal(_aliases(merged.uri_aliases), _aliases(full.uri_aliases))
+
+def test_extended_cube_equals_rebuilt_cube(exports):
+    _, older, newer = exports
+    merged, _ = Dataset(*ingest.prepare_dataset(older)).append(newer)
+    rebuilt = rollup.build_cube(merged.df)
+    pd.testing.assert_frame_equal(merged.rollup.cells.reset_index(drop=True), rebuilt.cells, check_dtype=False)
+    assert np.array_equal(merged.rollup.day_offsets, rebuilt.day_offsets)
+
+def test_reappending_adds_nothing(exports):
+    _, older, newer = exports
+    merged, _ = Dataset(*ingest.prepare_dataset(older)).append(newer)
+    again, report = merged.append(newer)
+    assert report.new_rows == 0
+    assert report.duplicate_rows + report.dropped_rows == len(newer)
+    assert again is merged
@@ -0,0 +1,67 @@
+import zipfile
+
+import pandas as pd
+import pytest
+
+import archive
+import ingest
+
+def _same_plays(found, expected):
+    expected = expected.reset_index(drop=True)
+    assert list(found.columns) == list(expected.columns)
+    for column in expected.columns:
+        assert found[column].astype(object).equals(expected[column].astype(object)), column
+
+def test_round_trip(dataset, tmp_path):
+    path = archive.write_archive(dataset.df, tmp_path / 'plays.zip')
+    assert archive.archive_years(path) == sorted(dataset.df['ts'].dt.year.unique())
+    pd.testing.assert_frame_equal(archive.read_archive(path), dataset.df)
+
+# partial: the range covers only part of the years it touches, so row groups get skipped
+@pytest.mark.parametrize('start, end, partial', [
+    ('2016-01-01', '2017-01-01', False),
+    ('2015-06-15', '2016-02-01', True),
+    ('2017-03-01 12:30', None, True),
+    (None, '2015-01-20', True)
+])
+def test_range_reads_only_overlapping_parts(dataset, tmp_path, monkeypatch, start, end, partial):
+    monkeypatch.setattr(archive, 'ROW_GROUP_ROWS', 500)
+    path = archive.write_archive(dataset.df, tmp_path / 'plays.zip')
+    start = None if start is None else pd.Timestamp(start, tz='UTC')
+    end = None if end is None else pd.Timestamp(end, tz='UTC')
+
+    read_groups = []
+    row_groups = archive._row_groups
+    def spy(parquet_file, start, end):
+        groups = row_groups(parquet_file, start, end)
+        read_groups.append((parquet_file.metadata.num_row_groups, len(groups)))
+        return groups
+    monkeypatch.setattr(archive, '_row_groups', spy)
+
+    found = archive.read_archive(path, start=start, end=end, columns=list(ingest.INGEST_COLUMNS))
+    ts = dataset.df['ts']
+    keep = pd.Series(True, index=dataset.df.index)
+    if start is not None:
+        keep &= ts >= start
+    if end is not None:
+        keep &= ts < end
+    _same_plays(found, dataset.df.loc[keep, found.columns])
+
+    # Years outside the range are never opened
+    assert len(read_groups) < len(archive.archive_years(path))
+    total, read = map(sum, zip(*read_groups))
+    assert read < total if partial else read == total
+
+def test_empty_range_raises(dataset, tmp_path):
+    path = archive.write_archive(dataset.df, tmp_path / 'plays.zip')
+    with pytest.raises(ValueError):
+        archive.read_archive(path, start=pd.Timestamp('2030-01-01', tz='UTC'))
+
+# e.g. the zip Spotify sends, of JSON files
+def test_zip_without_year_parts(tmp_path):
+    path = tmp_path / 'my_spotify_data.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('Spotify Extended Streaming History/Streaming_History_Audio_2023.json', '[]')
+    assert archive.archive_years(path) == []
+    with pytest.raises(ValueError):
+        archive.read_archive(path)
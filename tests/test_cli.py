@@ -0,0 +1,30 @@
+import json
+
+import pandas as pd
+
+import archive
+import cli
+
+def test_all_entities_json_report(dataset, tmp_path):
+    saved = archive.write_archive(dataset.df, tmp_path / 'plays.zip')
+    out = tmp_path / 'report'
+    cli.main([str(saved), '--out', str(out), '--all-entities'])
+
+    with open(out / 'report.json') as f:
+        report = json.load(f)
+    assert report['rows'] == len(dataset.df)
+    for entity in ['track', 'artist', 'album']:
+        rows = report['tables'][f'all.{entity}_stats']
+        expected = dataset.entity_stats.table(entity)
+        assert len(rows) == len(expected)
+        assert rows[0]['peak_month'] == str(pd.Period(rows[0]['peak_month'], freq='M'))
+        assert rows[0]['most_plays_in_day_date'] == str(pd.Period(rows[0]['most_plays_in_day_date'], freq='D'))
+
+def test_csv_and_json_agree_on_periods(dataset, tmp_path):
+    saved = archive.write_archive(dataset.df, tmp_path / 'plays.zip')
+    cli.main([str(saved), '--out', str(tmp_path / 'json'), '--all-entities'])
+    cli.main([str(saved), '--out', str(tmp_path / 'csv'), '--all-entities', '--format', 'csv'])
+    with open(tmp_path / 'json' / 'report.json') as f:
+        from_json = pd.DataFrame(json.load(f)['tables']['all.artist_stats'])
+    from_csv = pd.read_csv(tmp_path / 'csv' / 'all.artist_stats.csv')
+    assert from_json['peak_month'].tolist() == from_csv['peak_month'].tolist()
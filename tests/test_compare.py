@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import compare
+from analyticsFuncs import MS_MIN_CONVERSION
+
+LEVELS = [('songs', 'spotify_track_uri'), ('artists', 'artist_name'), ('albums', 'album_name')]
+
+@pytest.fixture(scope='module')
+def periods(dataset):
+    first_day, end_day = dataset.full_range()
+    years = compare.available_periods(first_day, end_day, compare.GRAINS['Year'])
+    # Two calendar years and a custom range cutting across them
+    return [years[0], years[1], compare.date_period((years[0].start + pd.Timedelta(days=200)).date(), (years[1].start + pd.Timedelta(days=45)).date())]
+
+@pytest.mark.parametrize('level, key', LEVELS)
+def test_period_columns_match_range_summaries(dataset, periods, level, key):
+    table = getattr(dataset.compare(periods), level).table
+    for period in periods:
+        summary = getattr(dataset.range_summaries(period.start, period.end), level)
+        played = table[table[f'{period.label} plays'] > 0]
+        ours = played.set_index(played[key].astype(str)).sort_index()
+        expected = summary.set_index(summary[key].astype(str)).sort_index()
+
+        assert list(ours.index) == list(expected.index)
+        assert np.array_equal(ours[f'{period.label} plays'].to_numpy(), expected['total_plays'].to_numpy())
+        assert np.allclose(ours[f'{period.label} minutes'].to_numpy(), expected['total_minutes'].to_numpy())
+        assert np.allclose(ours[f'{period.label} skip %'].to_numpy(), expected['skip_percentage'].to_numpy())
+
+def test_totals_match_plays_in_range(dataset, periods):
+    totals = dataset.compare(periods).totals
+    for period, row in zip(periods, totals.itertuples()):
+        plays = dataset.time_index.slice(dataset.df, period.start, period.end)
+        assert row.plays == len(plays)
+        assert np.isclose(row.minutes, plays['ms_played'].sum() / MS_MIN_CONVERSION)
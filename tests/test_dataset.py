@@ -0,0 +1,25 @@
+import threading
+import time
+
+import dataset as dataset_module
+from dataset import Dataset
+
+def test_entity_stats_built_once_across_threads(dataset, monkeypatch):
+    built = []
+    def slow_stats(df, rollup):
+        built.append(threading.get_ident())
+        time.sleep(0.2)
+        return object()
+    monkeypatch.setattr(dataset_module, 'EntityStats', slow_stats)
+
+    ds = Dataset(dataset.df, dataset.uri_aliases, dataset.rollup, dataset.fingerprint)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ds.entity_stats)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built) == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    assert ds.entity_stats is results[0]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from downsample import downsample, lttb
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.integers(1, 5, n)).astype(np.int64)
+    y = np.abs(np.cumsum(rng.normal(size=n))) + rng.random(n)
+    return x, y
+
+@pytest.mark.parametrize('n, threshold', [(5000, 1000), (1001, 1000), (3650, 3), (10000, 57)])
+def test_downsample_keeps_ends_and_peak(n, threshold):
+    x, y = _series(n)
+    picks = downsample(x, y, threshold)
+    assert len(picks) == threshold
+    assert picks[0] == 0 and picks[-1] == n - 1
+    assert int(np.argmax(y)) in picks
+    assert (np.diff(picks) > 0).all()
+
+def test_downsample_peak_missed_by_lttb():
+    # In the peak's bucket a deeper trough makes the larger triangle, so lttb alone drops the peak
+    x = np.arange(2000)
+    y = np.zeros(2000)
+    y[505], y[506] = 10, -100
+    assert 505 not in lttb(x, y, 100)
+    picks = downsample(x, y, 100)
+    assert len(picks) == 100 and 505 in picks
+
+@pytest.mark.parametrize('threshold', [2, 500, 600])
+def test_short_series_are_kept_whole(threshold):
+    x, y = _series(500)
+    assert np.array_equal(downsample(x, y, threshold), np.arange(500))
+
+def test_lttb_matches_reference():
+    x, y = _series(3000, seed=1)
+    threshold = 200
+    expected = [0]
+    every = (len(y) - 2) / (threshold - 2)
+    for i in range(threshold - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        next_hi = min(int((i + 2) * every) + 1, len(y))
+        if i == threshold - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_x, next_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        prev = expected[-1]
+        areas = np.abs((x[prev] - next_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (next_y - y[prev]))
+        expected.append(lo + int(np.argmax(areas)))
+    expected.append(len(y) - 1)
+    assert np.array_equal(lttb(x, y, threshold), expected)
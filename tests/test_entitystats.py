@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyticsFuncs
+
+# The row-level stats' to_period on tz-aware ts
+pytestmark = pytest.mark.filterwarnings('ignore:Converting to PeriodArray')
+
+SAMPLE = 15
+PERIOD_FIELDS = [('peak_month', 'peak_month_count', 'M'), ('most_plays_in_day_date', 'most_plays_in_day', 'D')]
+
+# The most played names plus a spread of the rest, down to single plays
+def _sample(df, column):
+    counts = df[column].value_counts()
+    counts = counts[counts > 0]
+    picks = np.unique(np.linspace(0, len(counts) - 1, SAMPLE).astype(int))
+    return list(counts.index[picks])
+
+def _history(df, column, name):
+    return df[df[column] == name]
+
+# Ties between months or days may resolve to either one, so a period only has to be one
+# the history really peaks in
+def _assert_peaks(found, expected, history):
+    for period, count, freq in PERIOD_FIELDS:
+        assert getattr(found, count) == getattr(expected, count)
+        counts = history['ts'].dt.tz_localize(None).dt.to_period(freq).value_counts()
+        assert counts[getattr(found, period)] == getattr(expected, count)
+
+def _assert_fields(found, expected, skip):
+    for field in vars(expected):
+        if field in skip:
+            continue
+        value, want = getattr(found, field), getattr(expected, field)
+        if isinstance(want, float):
+            assert value == pytest.approx(want), field
+        else:
+            assert value == want, field
+
+def test_song_stats_match_row_level(dataset):
+    for uri in _sample(dataset.df, 'spotify_track_uri'):
+        history = _history(dataset.df, 'spotify_track_uri', uri)
+        found = dataset.entity_stats.song_stats(history)
+        expected = analyticsFuncs.song_sum_stats(history)
+        assert found is not None
+        _assert_fields(found, expected, {period for period, _, _ in PERIOD_FIELDS})
+        _assert_peaks(found, expected, history)
+
+# Songs with the same number of listens may come in either order
+def _by_song(full_hist):
+    full_hist = full_hist.astype({'Song': object, **({'Album': object} if 'Album' in full_hist else {})})
+    return full_hist.sort_values(['Listens', 'Song'], ascending=[False, True]).reset_index(drop=True)
+
+@pytest.mark.parametrize('level, column', [
+    ('artist', 'master_metadata_album_artist_name'),
+    ('album', 'master_metadata_album_album_name')
+])
+def test_artist_album_stats_match_row_level(dataset, level, column):
+    flags = {'artist': level == 'artist', 'album': level == 'album'}
+    for name in _sample(dataset.df, column):
+        history = _history(dataset.df, column, name)
+        found = dataset.entity_stats.artist_album_stats(history, **flags)
+        expected = analyticsFuncs.artist_album_sum_stats(history, **flags)
+        assert found is not None
+
+        tables = {'full_hist', 'top_songs', 'first_song_row', 'last_song_row'}
+        _assert_fields(found, expected, tables | {period for period, _, _ in PERIOD_FIELDS})
+        _assert_peaks(found, expected, history)
+        assert found.first_song_row.equals(expected.first_song_row)
+        assert found.last_song_row.equals(expected.last_song_row)
+
+        pd.testing.assert_frame_equal(_by_song(found.full_hist), _by_song(expected.full_hist), check_dtype=False)
+        assert list(found.top_songs['Listens']) == list(expected.top_songs['Listens'])
+        assert list(found.full_hist.columns) == list(expected.full_hist.columns)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyticsFuncs
+import rollup
+
+# Counts of each value of a calendar field, as a dense array from first to first + size - 1
+def _counts(values, first, size):
+    return values.value_counts().reindex(range(first, first + size), fill_value=0).to_numpy()
+
+def _assert_matches_plays(histograms, plays):
+    ts = plays['ts']
+    assert np.array_equal(histograms.hours, _counts(ts.dt.hour, 0, 24))
+    assert np.array_equal(histograms.weekdays, _counts(ts.dt.dayofweek, 0, 7))
+    assert np.array_equal(histograms.days_of_month, _counts(ts.dt.day, 1, 31))
+    assert np.array_equal(histograms.months, _counts(ts.dt.month, 1, 12))
+    expected = pd.crosstab(ts.dt.dayofweek, ts.dt.hour).reindex(index=range(7), columns=range(24), fill_value=0)
+    assert np.array_equal(histograms.hour_weekday, expected.to_numpy())
+
+def test_plays_histograms(dataset):
+    _assert_matches_plays(analyticsFuncs.temporal_histograms(dataset.df), dataset.df)
+
+@pytest.mark.parametrize('start, end', [
+    (None, None),
+    ('2015-02-28', '2016-03-01'),
+    ('2017-06-15', '2017-06-16')
+])
+def test_cube_histograms(dataset, start, end):
+    if start is None:
+        start, end = dataset.full_range()
+    else:
+        start, end = pd.Timestamp(start, tz='UTC'), pd.Timestamp(end, tz='UTC')
+    plays = dataset.time_index.slice(dataset.df, start, end)
+    _assert_matches_plays(rollup.temporal_histograms(dataset.rollup, start, end), plays)
+
+def test_single_track_histograms(dataset):
+    uri = dataset.df['spotify_track_uri'].value_counts().index[25]
+    plays = dataset.df[dataset.df['spotify_track_uri'] == uri]
+    _assert_matches_plays(analyticsFuncs.temporal_histograms(plays), plays)
@@ -0,0 +1,63 @@
+import threading
+import tracemalloc
+
+import instrument
+
+def _in_thread(func):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=func()))
+    thread.start()
+    return thread, result
+
+def test_runs_keep_their_own_flags():
+    instrument.begin_run('profiled', enabled=True)
+    thread, result = _in_thread(lambda: (instrument.begin_run('plain'), instrument.end_run())[1])
+    thread.join()
+    assert result['value'] is None
+    profile = instrument.end_run()
+    assert profile is not None and profile.name == 'profiled'
+
+def test_other_sessions_do_not_stop_allocation_tracking():
+    started = threading.Event()
+    other_done = threading.Event()
+
+    def traced():
+        instrument.begin_run('traced', enabled=True, allocations=True)
+        with instrument.span('allocate'):
+            started.set()
+            other_done.wait()
+            block = [bytearray(1024) for _ in range(2000)]
+            del block
+        return instrument.end_run()
+
+    thread, result = _in_thread(traced)
+    started.wait()
+    instrument.begin_run('untraced', enabled=True)
+    instrument.end_run()
+    assert tracemalloc.is_tracing()
+    other_done.set()
+    thread.join()
+
+    assert result['value'].spans[0].peak_kb > 1000
+    assert not tracemalloc.is_tracing()
+
+def test_abandoned_run_releases_tracing():
+    instrument.begin_run('interrupted', enabled=True, allocations=True)
+    assert tracemalloc.is_tracing()
+    # A rerun that was cut short never calls end_run before the next one begins
+    instrument.begin_run('next', enabled=True)
+    assert not tracemalloc.is_tracing()
+    instrument.end_run()
+
+def test_section_rerun_is_its_own_run():
+    with instrument.section('fragment', enabled=True) as timing:
+        with instrument.span('work'):
+            pass
+    assert timing.profile.name == 'fragment'
+    assert [span.name for span in timing.profile.spans] == ['work']
+
+    instrument.begin_run('page', enabled=True)
+    with instrument.section('fragment', enabled=True) as timing:
+        pass
+    assert timing.profile is None
+    assert [span.name for span in instrument.end_run().spans] == ['fragment']
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyticsFuncs
+
+SORT_CONFIGS = {
+    'by_plays': {'by': 'total_plays', 'ascending': False},
+    'by_minutes': {'by': 'total_minutes', 'ascending': False},
+    'lowest_skip': {'by': ['skip_percentage', 'total_plays'], 'ascending': [True, False], 'min_plays': 20},
+    'highest_skip': {'by': 'skip_percentage', 'ascending': False, 'min_plays': 20}
+}
+
+def _expected(df, config, n):
+    if 'min_plays' in config:
+        df = df[df['total_plays'] >= config['min_plays']]
+    return df.sort_values(config['by'], ascending=config['ascending'], kind='stable').head(n)
+
+# Few distinct values, so most of the top n are ties
+def _summary_with_ties(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    plays = rng.integers(1, 40, rows)
+    return pd.DataFrame({
+        'name': [f'Song {i}' for i in range(rows)],
+        'total_plays': plays,
+        'total_minutes': rng.integers(0, 5, rows) * 2.5,
+        'skip_percentage': rng.integers(0, 4, rows) * 25.0
+    })
+
+@pytest.mark.parametrize('n', [1, 5, 50, 1000])
+def test_top_n_equals_sort_head(n):
+    summary = _summary_with_ties()
+    results = analyticsFuncs.get_top_n(summary, SORT_CONFIGS, n=n, min_plays_filter=True)
+    for key, config in SORT_CONFIGS.items():
+        pd.testing.assert_frame_equal(results[key], _expected(summary, config, n))
+
+def test_rank_order_is_per_summary():
+    first = _summary_with_ties(seed=1)
+    second = _summary_with_ties(seed=2)
+    for summary in [first, second, first]:
+        results = analyticsFuncs.get_top_n(summary, SORT_CONFIGS, n=5, min_plays_filter=True)
+        pd.testing.assert_frame_equal(results['by_plays'], _expected(summary, SORT_CONFIGS['by_plays'], 5))
+
+def test_rank_songs_matches_sorted_summary(dataset):
+    summaries = dataset.range_summaries(*dataset.full_range())
+    top = analyticsFuncs.rank_songs(summaries.songs)
+    expected = summaries.songs.sort_values('total_plays', ascending=False, kind='stable').head(len(top.by_plays))
+    assert top.by_plays['spotify_track_uri'].tolist() == expected['spotify_track_uri'].tolist()
@@ -0,0 +1,36 @@
+import registry
+from dataset import Dataset
+
+def _fresh(dataset):
+    return Dataset(dataset.df, dataset.uri_aliases, dataset.rollup, dataset.fingerprint)
+
+def test_dataset_bytes_include_indexes(dataset):
+    frame_and_cube = registry.memory_usage(dataset.df) + registry.sizeof(dataset.rollup) + registry.memory_usage(dataset.uri_aliases)
+    assert registry._search_bytes(dataset.search_index) > 0
+    assert registry._dataset_bytes(dataset) == frame_and_cube + registry._search_bytes(dataset.search_index) + registry._time_index_bytes(dataset)
+
+def test_entity_stats_counted_once_built(dataset):
+    ds = _fresh(dataset)
+    reg = registry.DatasetRegistry(budget_bytes=10 ** 12)
+    reg.lease(ds)
+    before = reg.usage().dataset_bytes
+    assert before == registry._dataset_bytes(ds)
+
+    stats = ds.entity_stats
+    assert reg.usage().dataset_bytes == before + registry._entity_stats_bytes(stats)
+    assert registry._entity_stats_bytes(stats) > 0
+
+def test_built_entity_stats_count_against_budget(dataset):
+    ds = _fresh(dataset)
+    other = _fresh(dataset)
+    other.fingerprint = 'other'
+    reg = registry.DatasetRegistry(budget_bytes=registry._dataset_bytes(ds) * 2 + registry.CACHE.bytes + 1)
+    held = reg.lease(other)
+    reg.lease(ds)  # released as soon as the lease is dropped
+    assert reg.usage().datasets == 2 and reg.usage().sessions == 1
+
+    # Building the held dataset's reports pushes the total over, so the unheld one goes
+    other.entity_stats
+    reg.enforce()
+    assert list(reg.entries) == ['other']
+    assert held.dataset is other
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import analyticsFuncs
+from compact import ENTITY_COLUMNS
+
+QUERIES = ['a', 'La', 'mor', 'KA NE', 'xyzzy', '']
+
+# Both are row subsets of the same frame, so equal indexes mean equal results
+def _assert_same_rows(found, expected):
+    assert np.array_equal(found.index.to_numpy(), expected.index.to_numpy())
+
+def _names(dataset, entity, n=3):
+    return list(dataset.df[ENTITY_COLUMNS[entity]].value_counts().index[:n])
+
+@pytest.mark.parametrize('entity', ['track', 'artist', 'album'])
+def test_match_equals_str_contains(dataset, entity):
+    column = ENTITY_COLUMNS[entity]
+    queries = QUERIES + [name[1:6] for name in _names(dataset, entity)]
+    for query in queries:
+        expected = analyticsFuncs.filter_dataframe(dataset.df, column, query)
+        found = analyticsFuncs.filter_dataframe(dataset.df, column, query, index=dataset.search_index)
+        _assert_same_rows(found, expected)
+
+@pytest.mark.parametrize('entity', ['track', 'artist', 'album'])
+def test_exact_match(dataset, entity):
+    column = ENTITY_COLUMNS[entity]
+    for query in _names(dataset, entity) + ['not a name']:
+        expected = analyticsFuncs.filter_dataframe(dataset.df, column, query, exact=True)
+        found = analyticsFuncs.filter_dataframe(dataset.df, column, query, exact=True, index=dataset.search_index)
+        _assert_same_rows(found, expected)
+
+def test_song_refined_by_artist(dataset):
+    track = _names(dataset, 'track', 1)[0]
+    artist = dataset.df.loc[dataset.df[ENTITY_COLUMNS['track']] == track, ENTITY_COLUMNS['artist']].iloc[0]
+    for exact, song, refine in [(True, track, artist), (False, track[:4].lower(), artist[:3].upper())]:
+        expected = analyticsFuncs.get_song(dataset.df, song, exact=exact, artist=refine)
+        found = analyticsFuncs.get_song(dataset.df, song, exact=exact, artist=refine, index=dataset.search_index)
+        _assert_same_rows(found, expected)
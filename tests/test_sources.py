@@ -0,0 +1,71 @@
+import dataclasses
+
+import pandas as pd
+import pytest
+
+import analyticsFuncs
+import archive
+import ingest
+from benchmarks.generate import write_json
+from entitystats import EntityStats
+from rollup import build_cube
+
+# The same plays read back each way an upload can arrive, before prepare_dataset
+def _from_json(raw, tmp_path):
+    df, _ = ingest.load_json_files(write_json(raw, str(tmp_path)))
+    return df
+
+def _from_object_parquet(raw, tmp_path):
+    # Older saved files: text as plain Python strings
+    text = raw.select_dtypes(include=['category', 'str']).columns
+    raw.astype({column: object for column in text}).to_parquet(tmp_path / 'plays.parquet', index=False)
+    return pd.read_parquet(tmp_path / 'plays.parquet')
+
+def _from_pyarrow_parquet(raw, tmp_path):
+    raw.to_parquet(tmp_path / 'plays.parquet', index=False)
+    return pd.read_parquet(tmp_path / 'plays.parquet', dtype_backend='pyarrow')
+
+def _from_archive(raw, tmp_path):
+    df, _ = ingest.prepare_dataset(raw)
+    archive.write_archive(df, tmp_path / 'plays.zip')
+    return archive.read_archive(tmp_path / 'plays.zip', columns=list(ingest.INGEST_COLUMNS))
+
+SOURCES = [_from_json, _from_object_parquet, _from_pyarrow_parquet, _from_archive]
+
+# Names compared as text, as the storage (categories over Arrow or Python strings) is what
+# differs. Summaries come out in category order, which is the source's, so rows are put in
+# key order first.
+def _comparable(df, key=None):
+    df = df.astype({column: object for column in df.select_dtypes(include=['category', 'str', 'string']).columns})
+    if key is not None:
+        df = df.sort_values(key, kind='stable')
+    return df.reset_index(drop=True)
+
+def _assert_same(found, expected, key=None):
+    pd.testing.assert_frame_equal(_comparable(found, key), _comparable(expected, key))
+
+@pytest.fixture(scope='module')
+def reference(raw):
+    df, _ = ingest.prepare_dataset(raw[list(ingest.INGEST_COLUMNS)])
+    return df
+
+@pytest.mark.parametrize('load', SOURCES, ids=lambda load: load.__name__[1:])
+def test_analytics_match_across_sources(raw, reference, tmp_path, load):
+    df, _ = ingest.prepare_dataset(load(raw[list(ingest.INGEST_COLUMNS)], tmp_path))
+    for column in ingest.INGEST_COLUMNS:
+        if reference[column].dtype == 'category':
+            assert df[column].cat.categories.dtype == reference[column].cat.categories.dtype, column
+
+    levels, expected_levels = analyticsFuncs.levelAnalytics(df), analyticsFuncs.levelAnalytics(reference)
+    for field, key in zip(dataclasses.fields(levels), ['spotify_track_uri', 'artist_name', 'album_name']):
+        _assert_same(getattr(levels, field.name), getattr(expected_levels, field.name), key)
+
+    assert analyticsFuncs.basicStats(df) == analyticsFuncs.basicStats(reference)
+
+    polar, expected_polar = analyticsFuncs.get_data_for_polar_plots(df), analyticsFuncs.get_data_for_polar_plots(reference)
+    for field in dataclasses.fields(polar):
+        _assert_same(getattr(polar, field.name), getattr(expected_polar, field.name))
+
+    stats, expected_stats = EntityStats(df, build_cube(df)), EntityStats(reference, build_cube(reference))
+    for entity, key in [('track', 'spotify_track_uri'), ('artist', 'artist_name'), ('album', 'album_name')]:
+        _assert_same(stats.table(entity), expected_stats.table(entity), key)
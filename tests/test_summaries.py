@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyticsFuncs
+
+# The row-level groupby each level was summarised with before the cube cells
+ROW_LEVEL = {
+    'songs': ('spotify_track_uri', 'spotify_track_uri', {
+        'track_name': ('master_metadata_track_name', 'first'),
+        'artist_name': ('master_metadata_album_artist_name', 'first'),
+        'album_name': ('master_metadata_album_album_name', 'first')
+    }),
+    'artists': ('master_metadata_album_artist_name', 'artist_name', {
+        'unique_tracks': ('master_metadata_track_name', 'nunique'),
+        'unique_albums': ('master_metadata_album_album_name', 'nunique')
+    }),
+    'albums': ('master_metadata_album_album_name', 'album_name', {
+        'unique_tracks': ('master_metadata_track_name', 'nunique'),
+        'artist_name': ('master_metadata_album_artist_name', 'first')
+    })
+}
+
+def _comparable(df, key):
+    df = df.astype({column: object for column in df.select_dtypes(include=['category', 'str']).columns})
+    return df.sort_values(key, kind='stable').reset_index(drop=True)
+
+# Some plays without names and with unknown skips, as podcasts and old exports have
+@pytest.fixture(scope='module', params=['complete', 'gaps'])
+def plays(request, dataset):
+    df = dataset.df
+    if request.param == 'gaps':
+        rng = np.random.default_rng(3)
+        df = df.copy()
+        for column in ['master_metadata_track_name', 'master_metadata_album_artist_name', 'master_metadata_album_album_name', 'spotify_track_uri']:
+            df.loc[rng.random(len(df)) < 0.03, column] = np.nan
+        df['skipped'] = df['skipped'].astype('boolean')
+        df.loc[rng.random(len(df)) < 0.05, 'skipped'] = pd.NA
+    return df
+
+@pytest.mark.parametrize('level', list(ROW_LEVEL))
+def test_cells_match_row_level_groupby(plays, level):
+    group_col, name, name_cols = ROW_LEVEL[level]
+    expected = analyticsFuncs.aggregate_by(plays, group_col, name_cols).rename(columns={group_col: name})
+    found = getattr(analyticsFuncs.levelAnalytics(plays), level)
+
+    assert list(found.columns) == list(expected.columns)
+    assert {'total_plays', 'plays_no_skips', 'total_minutes', 'mean_listen_mins', 'skip_percentage'} <= set(found.columns)
+    pd.testing.assert_frame_equal(_comparable(found, name), _comparable(expected, name), check_dtype=False)
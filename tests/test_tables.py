@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import tables
+from cache import DataView
+from models import ViewKey
+
+ROWS = 103
+
+# Plays with many ties, some missing values, and text both as categories and plain strings
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(7)
+    names = pd.Series(rng.choice(['Alpha', 'beta', 'Gamma', 'delta', None], ROWS)).astype('category')
+    minutes = rng.integers(0, 20, ROWS).astype(float)
+    minutes[rng.random(ROWS) < 0.1] = np.nan
+    return pd.DataFrame({
+        'name': names,
+        'plays': rng.integers(0, 5, ROWS),
+        'minutes': minutes,
+        'note': pd.Series(rng.choice(['first listen', 'repeat', 'Skipped early'], ROWS), dtype='str')
+    }, index=pd.RangeIndex(1000, 1000 + ROWS))
+
+def _all_rows(df, **options):
+    result = tables.table_page(df, page_size=ROWS, **options)
+    assert result.pages == 1
+    return result.rows
+
+@pytest.mark.parametrize('ascending', [True, False])
+def test_sort_direction_and_ties(df, ascending):
+    rows = _all_rows(df, sort_column='minutes', ascending=ascending)
+    values = rows['minutes']
+    assert len(rows) == ROWS
+    # Missing values last either way
+    known = values.notna().sum()
+    assert values.iloc[known:].isna().all()
+    steps = np.diff(values.iloc[:known].to_numpy())
+    assert (steps >= 0).all() if ascending else (steps <= 0).all()
+    # Equal values keep the table's order
+    for _, group in rows.groupby('minutes', dropna=False, sort=False):
+        assert group.index.is_monotonic_increasing
+
+def test_sort_matches_stable_sort_values(df):
+    for column in df.columns:
+        for ascending in [True, False]:
+            expected = df.sort_values(column, ascending=ascending, kind='stable', na_position='last')
+            pd.testing.assert_frame_equal(_all_rows(df, sort_column=column, ascending=ascending), expected)
+
+def test_filter_is_case_insensitive(df):
+    rows = _all_rows(df, filter_column='name', text='ALPHA')
+    assert (rows['name'] == 'Alpha').all()
+    assert len(rows) == (df['name'] == 'Alpha').sum()
+
+def test_filter_any_text_column(df):
+    rows = _all_rows(df, text='e')
+    matched = df['name'].astype(str).str.contains('e', case=False) & df['name'].notna()
+    matched |= df['note'].str.contains('e', case=False)
+    pd.testing.assert_frame_equal(rows, df[matched])
+
+def test_filter_with_no_matches(df):
+    result = tables.table_page(df, filter_column='name', text='no such name', page=3)
+    assert result.rows.empty
+    assert (result.matched_rows, result.total_rows) == (0, ROWS)
+    assert (result.page, result.pages) == (1, 1)
+    assert (result.first_row, result.last_row) == (0, 0)
+
+def test_filter_then_sort(df):
+    rows = _all_rows(df, sort_column='plays', ascending=False, filter_column='note', text='repeat')
+    expected = df[df['note'] == 'repeat'].sort_values('plays', ascending=False, kind='stable')
+    pd.testing.assert_frame_equal(rows, expected)
+
+def test_last_page_is_shorter(df):
+    result = tables.table_page(df, page=5, page_size=25)
+    assert result.pages == 5
+    assert len(result.rows) == 3
+    assert (result.first_row, result.last_row) == (101, 103)
+    pd.testing.assert_frame_equal(result.rows, df.iloc[100:])
+
+def test_page_past_the_end_shows_last_page(df):
+    result = tables.table_page(df, sort_column='plays', page=9, page_size=25)
+    assert result.page == 5
+    assert len(result.rows) == 3
+
+def test_data_view_gives_same_pages(df):
+    view = DataView(df, ViewKey('tables-test'))
+    for options in [{'sort_column': 'name'}, {'text': 'skip'}, {'sort_column': 'minutes', 'ascending': False, 'text': 'a'}]:
+        for _ in range(2):
+            pd.testing.assert_frame_equal(tables.table_page(view, page=2, page_size=25, **options).rows, tables.table_page(df, page=2, page_size=25, **options).rows)
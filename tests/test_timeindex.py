@@ -0,0 +1,17 @@
+import pandas as pd
+
+import rollup
+from timeindex import TimeIndex
+
+def test_slice_excludes_end():
+    ts = pd.to_datetime(['2024-01-01 00:00', '2024-01-01 12:00', '2024-01-02 00:00', '2024-01-02 00:01'], utc=True)
+    df = pd.DataFrame({'ts': ts})
+    index = TimeIndex(df)
+    sliced = index.slice(df, pd.Timestamp('2024-01-01', tz='UTC'), pd.Timestamp('2024-01-02', tz='UTC'))
+    assert sliced['ts'].tolist() == list(ts[:2])
+
+def test_slice_matches_rollup_ranges(dataset):
+    first, last = dataset.full_range()
+    for start, end in [(first, last), (first, first + pd.Timedelta(days=100)), (pd.Timestamp('2016-03-01', tz='UTC'), pd.Timestamp('2017-01-01', tz='UTC'))]:
+        sliced = dataset.time_index.slice(dataset.df, start, end)
+        assert len(sliced) == rollup.basic_stats(dataset.rollup, start, end).total_plays
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import timeseries
+from analyticsFuncs import MS_MIN_CONVERSION
+
+# Grain label -> the resample rule and period frequency the chart section used before
+RESAMPLE = {'Daily': ('D', 'D'), 'Weekly': ('W', 'W'), 'Monthly': ('ME', 'M'), 'Yearly': ('YE', 'Y')}
+
+def _resampled(plays, rule):
+    series = plays.set_index('ts').resample(rule)['ms_played'].agg(['sum', 'size']).reset_index()
+    series.columns = ['ts', 'ms_played', 'streams']
+    series['minutes'] = series['ms_played'] / MS_MIN_CONVERSION
+    return series
+
+def _assert_matches_resample(found, plays, label):
+    rule, freq = RESAMPLE[label]
+    expected = _resampled(plays, rule)
+    pd.testing.assert_frame_equal(found.series, expected, check_dtype=False)
+
+    peak = expected['minutes'].idxmax()
+    assert found.peak_minutes_date == expected['ts'].iloc[peak]
+    assert found.peak_minutes == pytest.approx(expected['minutes'].iloc[peak])
+
+    # Periods tied for the most streams may be reported as either one
+    counts = plays['ts'].dt.tz_localize(None).dt.to_period(freq).value_counts()
+    assert found.peak_streams == counts.max()
+    assert counts[found.peak_streams_period] == counts.max()
+
+    assert found.correlation == pytest.approx(expected['minutes'].corr(expected['streams']), nan_ok=True)
+
+@pytest.mark.parametrize('label', list(RESAMPLE))
+def test_plays_series_match_resample(dataset, label):
+    series = timeseries.time_series(dataset.df)
+    _assert_matches_resample(timeseries.grain(series, label), dataset.df, label)
+
+# A range starting and ending mid-week and mid-month, read from the rollup cube
+@pytest.mark.parametrize('label', list(RESAMPLE))
+def test_cube_series_match_resample(dataset, label):
+    start, end = pd.Timestamp('2015-03-18', tz='UTC'), pd.Timestamp('2017-05-11', tz='UTC')
+    plays = dataset.time_index.slice(dataset.df, start, end)
+    _assert_matches_resample(timeseries.grain(dataset.time_series(start, end), label), plays, label)
+
+def test_single_track_series(dataset):
+    uri = dataset.df['spotify_track_uri'].value_counts().index[40]
+    plays = dataset.df[dataset.df['spotify_track_uri'] == uri]
+    series = timeseries.time_series(plays)
+    for label in RESAMPLE:
+        _assert_matches_resample(timeseries.grain(series, label), plays, label)
+
+def test_no_plays():
+    assert timeseries.build_time_series(np.array([], dtype=np.int64), np.array([]), np.array([], dtype=np.int64)) is None
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+def ensure_sorted(df):
+    if df['ts'].is_monotonic_increasing:
+        return df
+    return df.sort_values('ts', kind='stable', ignore_index=True)
+
+# Binary-search index over the (sorted) ts column of the loaded dataset.
+# Range lookups return positional iloc slices, which pandas serves as views.
+class TimeIndex:
+    def __init__(self, df):
+        self.ns = df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.tz = df['ts'].dt.tz
+
+    def __len__(self):
+        return len(self.ns)
+
+    def _timestamp(self, ns):
+        return pd.Timestamp(ns, tz='UTC').tz_convert(self.tz) if self.tz else pd.Timestamp(ns)
+
+    @property
+    def first(self):
+        return self._timestamp(self.ns[0])
+
+    @property
+    def last(self):
+        return self._timestamp(self.ns[-1])
+
+    # Plays in [start, end), the same bounds the rollup cube's day ranges use
+    def positions(self, start, end):
+        lo = np.searchsorted(self.ns, pd.Timestamp(start).value, side='left')
+        hi = np.searchsorted(self.ns, pd.Timestamp(end).value, side='left')
+        return lo, hi
+
+    def slice(self, df, start, end):
+        lo, hi = self.positions(start, end)
+        return df.iloc[lo:hi]
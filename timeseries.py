@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import instrument
+from analyticsFuncs import MS_MIN_CONVERSION, NS_PER_DAY
+from cache import cached
+from models import GrainSeries, TimeSeries
+from rollup import daily_totals
+
+# Slider label -> (TimeSeries field, period frequency). Bins match resample('D'/'W'/'ME'/'YE'):
+# weeks end on Sunday and every bin is labelled with its last day.
+GRAINS = {
+    'Daily': ('daily', 'D'),
+    'Weekly': ('weekly', 'W'),
+    'Monthly': ('monthly', 'M'),
+    'Yearly': ('yearly', 'Y')
+}
+
+# Period number of each day (days since the epoch); the epoch was a Thursday
+def _periods(days, freq):
+    if freq == 'D':
+        return days
+    if freq == 'W':
+        return (days + 3) // 7
+    return days.astype('datetime64[D]').astype(f'datetime64[{freq}]').astype(np.int64)
+
+def _last_days(periods, freq):
+    if freq == 'D':
+        return periods
+    if freq == 'W':
+        return periods * 7 + 3
+    return (periods + 1).astype(f'datetime64[{freq}]').astype('datetime64[D]').astype(np.int64) - 1
+
+def _grain_series(days, ms, streams, freq):
+    periods = _periods(days, freq)
+    first = periods[0]
+    bins = periods - first
+    n = int(bins[-1]) + 1
+    ms_played = np.bincount(bins, weights=ms, minlength=n).astype(np.int64)
+    plays = np.bincount(bins, weights=streams, minlength=n).astype(np.int64)
+    last_days = _last_days(np.arange(first, first + n), freq)
+
+    series = pd.DataFrame({
+        'ts': pd.DatetimeIndex(last_days.astype('datetime64[D]').astype('datetime64[ns]')).tz_localize('UTC'),
+        'ms_played': ms_played,
+        'streams': plays,
+        'minutes': ms_played / MS_MIN_CONVERSION
+    })
+    peak_minutes = int(np.argmax(series['minutes'].to_numpy()))
+    peak_streams = int(np.argmax(plays))
+    return GrainSeries(
+        series=series,
+        peak_minutes_date=series['ts'].iloc[peak_minutes],
+        peak_minutes=series['minutes'].iloc[peak_minutes],
+        peak_streams_period=pd.Period(np.datetime64(int(last_days[peak_streams]), 'D'), freq=freq),
+        peak_streams=int(plays[peak_streams]),
+        correlation=series['minutes'].corr(series['streams'])
+    )
+
+# Every grain from one set of daily bins: sorted active days (days since the epoch) with
+# their ms played and stream counts. Coarser grains sum the bins, so no grain rescans plays.
+def build_time_series(days, ms, streams):
+    if len(days) == 0:
+        return None
+    return TimeSeries(**{field: _grain_series(days, ms, streams, freq) for field, freq in GRAINS.values()})
+
+def daily_bins(df):
+    ns = df['ts'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    days, day_idx = np.unique(ns // NS_PER_DAY, return_inverse=True)
+    ms = np.bincount(day_idx, weights=df['ms_played'].to_numpy(), minlength=len(days))
+    streams = np.bincount(day_idx, minlength=len(days))
+    return days, ms, streams
+
+# The Home page's series for a date range, from the rollup cube's daily cells
+def cube_time_series(cube, start, end):
+    return build_time_series(*daily_totals(cube, start, end))
+
+# The series of a set of plays, e.g. a Track/Artist/Album page history
+@cached
+def time_series(df):
+    return build_time_series(*daily_bins(df))
+
+def grain(series, label):
+    return getattr(series, GRAINS[label][0])
+
+instrument.instrument_module(globals())